@@ -1,8 +1,61 @@
-from peewee import SqliteDatabase, Model, AutoField, IntegerField, CharField, DateTimeField, ForeignKeyField, TextField
+from peewee import Model, AutoField, IntegerField, CharField, DateTimeField, ForeignKeyField, TextField
+from playhouse.migrate import SqliteMigrator, migrate
+from playhouse.pool import PooledSqliteDatabase
+from playhouse.sqlite_ext import FTS5Model, RowIDField, SearchField
+import copy
 import datetime
+from utilities.logger import logger
+from utilities.constants import (DATABASE_PATH, DATABASE_PROFILE, DATABASE_BUSY_TIMEOUT_MS, DATABASE_MAX_CONNECTIONS,
+                                 DATABASE_STALE_TIMEOUT)
 
-# Initialize database
-db = SqliteDatabase('attendance.db')
+# Storage profiles. All use WAL so background writers never block UI readers; they
+# differ in how much durability they trade for speed on power loss.
+SQLITE_PROFILES = {
+    # Every commit is fsynced before returning
+    "safe": {
+        "journal_mode": "wal",
+        "synchronous": "full",
+        "cache_size": -16000,  # 16 MB
+        "temp_store": "memory",
+    },
+    # Commits survive an application crash; the last few may be lost on power loss
+    "balanced": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "cache_size": -64000,  # 64 MB
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "memory",
+    },
+    # Bulk loads and benchmarks only
+    "fast": {
+        "journal_mode": "wal",
+        "synchronous": "off",
+        "cache_size": -128000,  # 128 MB
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "memory",
+    },
+}
+
+
+def sqlite_pragmas(profile):
+    # busy_timeout goes first so the journal_mode switch itself waits for other connections
+    return [("busy_timeout", DATABASE_BUSY_TIMEOUT_MS)] + list(SQLITE_PROFILES[profile].items())
+
+
+# Initialize database. Each thread gets its own connection (peewee keeps connection
+# state per thread); the pool hands closed connections back out instead of reopening
+# the file and reapplying pragmas for every background task. A pooled connection may
+# be reused by a different thread later, but never by two at once, hence
+# check_same_thread=False.
+db = PooledSqliteDatabase(DATABASE_PATH, pragmas=sqlite_pragmas(DATABASE_PROFILE),
+                          max_connections=DATABASE_MAX_CONNECTIONS, stale_timeout=DATABASE_STALE_TIMEOUT,
+                          check_same_thread=False)
+
+
+def configure_db(path=DATABASE_PATH, profile=DATABASE_PROFILE):
+    """Point the database at another file and/or storage profile; call before init_db()."""
+    db.init(path, pragmas=sqlite_pragmas(profile), max_connections=DATABASE_MAX_CONNECTIONS,
+            stale_timeout=DATABASE_STALE_TIMEOUT, check_same_thread=False)
 
 class BaseModel(Model):
     class Meta:
@@ -15,6 +68,15 @@ class Device(BaseModel):
     password = CharField(max_length=32, default='0')
     device_model = CharField(max_length=50)
     status = CharField(max_length=20, default="Offline")
+    last_attendance_at = DateTimeField(null=True, help_text='Newest punch timestamp ingested from the device')
+    last_record_count = IntegerField(default=0, help_text='Attendance log size on the device at the last pull')
+    last_record_at = DateTimeField(null=True, help_text='Timestamp of the last record in the device log at the last pull')
+    last_synced_at = DateTimeField(null=True, help_text='When attendance was last pulled from the device')
+    last_checked_at = DateTimeField(null=True, help_text='When the health monitor last probed the device')
+    last_seen_at = DateTimeField(null=True, help_text='When the device last answered a health probe')
+    latency_ms = IntegerField(null=True, help_text='Round-trip time of the last successful health probe')
+    failure_count = IntegerField(default=0, help_text='Consecutive failed operations, for the circuit breaker')
+    breaker_opened_at = DateTimeField(null=True, help_text='When the circuit breaker last opened; null when closed')
     created_at = DateTimeField(default=datetime.datetime.now)
 
     class Meta:
@@ -22,7 +84,7 @@ class Device(BaseModel):
 
 class User(BaseModel):
     uid = IntegerField(primary_key=True)
-    name = CharField(max_length=100)
+    name = CharField(max_length=100, index=True)
     role = IntegerField(help_text='Privilege level on the device')
     password = CharField(max_length=128, null=True)
     group_id = IntegerField(null=True)
@@ -36,17 +98,40 @@ class User(BaseModel):
     class Meta:
         table_name = 'users'
 
+    def save(self, *args, **kwargs):
+        # Stamp every edit and import, so incremental jobs such as cloud ID reconciliation see it
+        self.updated_at = datetime.datetime.now()
+        return super().save(*args, **kwargs)
+
 class Attendance(BaseModel):
     id = AutoField()
     user = ForeignKeyField(User, backref='attendances')
-    timestamp = DateTimeField()
+    timestamp = DateTimeField(index=True)
     status = CharField(max_length=20, help_text='Attendance status code')
     punch = CharField(max_length=20, help_text='Punch type (e.g., IN, OUT)')
     uid = IntegerField(null=True, help_text='Device-specific user identifier at punch')
     created_at = DateTimeField(default=datetime.datetime.now)
+    synced_at = DateTimeField(null=True, index=True, help_text='When the cloud acknowledged the record; null while pending')
 
     class Meta:
         table_name = 'attendance_logs'
+        indexes = (
+            (('uid', 'timestamp', 'status'), True),  # Punch identity; also serves lookups by uid
+        )
+
+class UnmatchedAttendance(BaseModel):
+    id = AutoField()
+    uid = IntegerField(help_text='Device user ID with no local user yet')
+    timestamp = DateTimeField()
+    status = CharField(max_length=20)
+    punch = CharField(max_length=20)
+    created_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        table_name = 'unmatched_attendance'  # Punches held until their user is pulled, added or imported
+        indexes = (
+            (('uid', 'timestamp', 'status'), True),
+        )
 
 class Settings(BaseModel):
     id = AutoField()
@@ -56,6 +141,191 @@ class Settings(BaseModel):
     class Meta:
         table_name = 'settings'
 
+class RowCounter(BaseModel):
+    table_name = CharField(max_length=50, primary_key=True)
+    row_count = IntegerField(default=0, help_text='Rows in the table, kept current by triggers')
+    version = IntegerField(default=0, help_text='Bumped by every write that can change a filtered count')
+
+    class Meta:
+        table_name = 'row_counters'
+
+class CloudBatch(BaseModel):
+    key = CharField(max_length=32, primary_key=True, help_text='Idempotency-Key the batch is posted under')
+    first_id = IntegerField()
+    last_id = IntegerField()
+    count = IntegerField(help_text='Pending rows in [first_id, last_id] when the batch was formed')
+    created_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        table_name = 'cloud_batches'  # Attendance batches posted but not yet acknowledged by the cloud
+
+class DeletedUser(BaseModel):
+    user_id = CharField(max_length=50, primary_key=True, help_text='User.user_id of the deleted user')
+    uid = IntegerField(help_text='Device user ID the user was pushed under')
+    deleted_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        table_name = 'deleted_users'  # Tombstones for users deleted in the app, so devices can be pruned safely
+
+class SearchLabel(BaseModel):
+    label = CharField(max_length=20, primary_key=True)
+
+    class Meta:
+        table_name = 'search_labels'  # Every status and punch value used in attendance, kept by triggers
+
+class UserSearch(FTS5Model):
+    """Full-text index over user names, user IDs and card numbers.
+
+    External content: the text lives in users and only the index is stored here.
+    Triggers installed by install_search_index keep it current.
+    """
+    rowid = RowIDField()
+    name = SearchField()
+    user_id = SearchField()
+    card = SearchField()
+
+    class Meta:
+        database = db
+        table_name = 'users_search'
+        options = {'content': 'users', 'content_rowid': 'uid', 'prefix': [2, 3],
+                   'tokenize': 'unicode61 remove_diacritics 2'}
+
+MODELS = [Device, User, Attendance, UnmatchedAttendance, Settings, RowCounter, SearchLabel, CloudBatch, DeletedUser]
+
+# Tables with maintained counters, and the columns whose updates can change a filtered
+# count (None: any column). Attendance leaves out synced_at so cloud uploads don't
+# invalidate cached counts.
+COUNTED_TABLES = {
+    Device: None,
+    User: None,
+    Attendance: ['user_id', 'uid', 'timestamp', 'status', 'punch'],
+}
+
+# Tables kept in step with a counted table by triggers; a query that reads one depends
+# on the counted table's writes even when it never names that table.
+MIRRORED_TABLES = {
+    UserSearch: User,
+    SearchLabel: Attendance,
+}
+
+def unindexed(field):
+    """Copy of field without its index; create_tables adds indexes under peewee's usual names."""
+    field = copy.copy(field)
+    field.index = field.unique = False
+    return field
+
+def migrate_db():
+    """Add columns introduced after an existing table was first created."""
+    migrator = SqliteMigrator(db)
+    tables = set(db.get_tables())
+    for model in MODELS:
+        table = model._meta.table_name
+        if table not in tables:
+            continue
+        existing = {column.name for column in db.get_columns(table)}
+        missing = [field for field in model._meta.sorted_fields if field.column_name not in existing]
+        if missing:
+            migrate(*[migrator.add_column(table, field.column_name, unindexed(field)) for field in missing])
+
+def dedupe_attendance():
+    """Prepare an existing attendance table for the unique (uid, timestamp, status) index.
+
+    Rows written before uid was always filled get it from their user, and repeated
+    punches are reduced to the oldest row, preferring one already delivered to the
+    cloud. Does nothing once the index exists.
+    """
+    table = Attendance._meta.table_name
+    if table not in db.get_tables():
+        return
+    if any(index.unique and index.columns == ['uid', 'timestamp', 'status'] for index in db.get_indexes(table)):
+        return
+    with db.atomic():
+        db.execute_sql(f'UPDATE "{table}" SET "uid" = "user_id" WHERE "uid" IS NULL')
+        cursor = db.execute_sql(f"""
+            DELETE FROM "{table}" WHERE "id" IN (
+                SELECT "id" FROM (
+                    SELECT "id", ROW_NUMBER() OVER (
+                        PARTITION BY "uid", "timestamp", "status" ORDER BY "synced_at" IS NULL, "id"
+                    ) AS "position" FROM "{table}"
+                ) WHERE "position" > 1
+            )""")
+    if cursor.rowcount:
+        logger.info(f"Removed {cursor.rowcount} duplicate attendance records before adding the unique punch index")
+
+def install_row_counters():
+    """Create the triggers that keep row_counters current and seed counters for new tables.
+
+    Runs in one transaction, so no write can land between counting a table and its
+    triggers taking over.
+    """
+    counter_table = RowCounter._meta.table_name
+    with db.atomic():
+        seeded = {name for (name,) in RowCounter.select(RowCounter.table_name).tuples()}
+        for model, columns in COUNTED_TABLES.items():
+            table = model._meta.table_name
+            update_of = f' OF {", ".join(columns)}' if columns else ''
+            for name, event, change in (('insert', 'INSERT', '+ 1'), ('delete', 'DELETE', '- 1'),
+                                        ('update', f'UPDATE{update_of}', '+ 0')):
+                db.execute_sql(
+                    f'CREATE TRIGGER IF NOT EXISTS "{table}_count_{name}" AFTER {event} ON "{table}" BEGIN '
+                    f'UPDATE "{counter_table}" SET "row_count" = "row_count" {change}, "version" = "version" + 1 '
+                    f"WHERE \"table_name\" = '{table}'; END"
+                )
+            if table not in seeded:
+                RowCounter.create(table_name=table, row_count=model.select().count())
+
+def trigger_exists(name):
+    return db.execute_sql("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone() is not None
+
+def install_search_index():
+    """Create the user full-text index and the attendance label vocabulary, with their triggers.
+
+    Both are filled from existing rows the first time only. Returns False when this
+    SQLite build has no FTS5, in which case searches fall back to LIKE.
+    """
+    attendance, labels = Attendance._meta.table_name, SearchLabel._meta.table_name
+    with db.atomic():
+        if not trigger_exists(f'{attendance}_labels_insert'):
+            db.execute_sql(f'INSERT OR IGNORE INTO "{labels}" ("label") '
+                           f'SELECT DISTINCT "status" FROM "{attendance}" UNION SELECT DISTINCT "punch" FROM "{attendance}"')
+        for name, event in (('insert', 'INSERT'), ('update', 'UPDATE OF status, punch')):
+            db.execute_sql(
+                f'CREATE TRIGGER IF NOT EXISTS "{attendance}_labels_{name}" AFTER {event} ON "{attendance}" BEGIN '
+                f'INSERT OR IGNORE INTO "{labels}" ("label") VALUES (NEW."status"), (NEW."punch"); END'
+            )
+
+    if not UserSearch.fts5_installed():
+        logger.warning("SQLite was built without FTS5; user and attendance search will use LIKE")
+        return False
+    users, index = User._meta.table_name, UserSearch._meta.table_name
+    columns = '"rowid", "name", "user_id", "card"'
+    new_values = 'NEW."uid", NEW."name", NEW."user_id", NEW."card"'
+    old_values = '\'delete\', OLD."uid", OLD."name", OLD."user_id", OLD."card"'
+    with db.atomic():
+        created = index not in db.get_tables()
+        UserSearch.create_table(safe=True)
+        if created:
+            db.execute_sql(f'INSERT INTO "{index}" ("{index}") VALUES (\'rebuild\')')
+        db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{users}_search_insert" AFTER INSERT ON "{users}" BEGIN '
+                       f'INSERT INTO "{index}" ({columns}) VALUES ({new_values}); END')
+        db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{users}_search_delete" AFTER DELETE ON "{users}" BEGIN '
+                       f'INSERT INTO "{index}" ("{index}", {columns}) VALUES ({old_values}); END')
+        db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{users}_search_update" AFTER UPDATE OF uid, name, user_id, card '
+                       f'ON "{users}" BEGIN '
+                       f'INSERT INTO "{index}" ("{index}", {columns}) VALUES ({old_values}); '
+                       f'INSERT INTO "{index}" ({columns}) VALUES ({new_values}); END')
+    return True
+
+def table_count(model):
+    """Total rows in a counted table, read from row_counters instead of a COUNT(*) scan."""
+    counter = RowCounter.get_or_none(RowCounter.table_name == model._meta.table_name)
+    return counter.row_count if counter else model.select().count()
+
 def init_db():
-    db.connect()
-    db.create_tables([Device, User, Attendance, Settings], safe=True)
\ No newline at end of file
+    db.connect(reuse_if_open=True)
+    migrate_db()
+    dedupe_attendance()
+    # Also creates indexes added to existing tables (CREATE INDEX IF NOT EXISTS)
+    db.create_tables(MODELS, safe=True)
+    install_row_counters()
+    install_search_index()
\ No newline at end of file
@@ -1,65 +1,77 @@
 from db.database import Attendance, User
+from utilities.pagination import KeysetPager
+from utilities.search import search_attendance
+import datetime
 import pandas as pd
 
 
 class AttendanceLogic:
+    USER_NAME = User.name.alias("user_name")  # Joined user's name, read from rows as row.user_name
+    # Orderings the list can be sorted by, each served by an index and ending in a unique key.
+    # By user: users walk the name index and each user's punches the (uid, timestamp, status) index.
+    SORT_KEYS = {
+        "id": [Attendance.id],
+        "timestamp": [Attendance.timestamp, Attendance.id],
+        "user": [USER_NAME, Attendance.uid, Attendance.timestamp, Attendance.status],
+        "uid": [Attendance.uid, Attendance.timestamp, Attendance.status],
+    }
+    DEFAULT_SORT = ("timestamp", True)  # Newest first
+
     def __init__(self, page_size=100):
         self.page_size = page_size
-        self.current_page = 1
-        self.attendances = []
-        self.total_count = 0
-        self.load_page(1)
+        self.apply_search(self.search(""))
 
-    def load_page(self, page):
-        self.current_page = page
-        offset = (page - 1) * self.page_size
-        query = (Attendance.select(
+    def query(self):
+        return (Attendance.select(
             Attendance.id,
             Attendance.timestamp,
-            User.name,
+            self.USER_NAME,
             Attendance.status,
             Attendance.punch,
-            Attendance.uid,
-            Attendance.user
+            Attendance.uid
         )
-                 .join(User, on=(Attendance.user == User.uid))
-                 .order_by(Attendance.timestamp.desc())
-                 .offset(offset)
-                 .limit(self.page_size))
-        self.attendances = list(query)
-        self.total_count = Attendance.select().count()
+                .join(User, on=(Attendance.user == User.uid))
+                .objects())  # Flat rows, so joined columns are attributes of the row itself
 
-    def get_page(self):
-        return self.attendances, self.current_page, (self.total_count + self.page_size - 1) // self.page_size
+    def search(self, search_text, date_filter=None, sort=None):
+        """Load the first page for these filters into a new pager and return it for apply_search().
 
-    def filter_attendance(self, search_text, date_filter=None):
+        sort is a (SORT_KEYS key, descending) pair. Leaves the current pager untouched,
+        so it can run on a worker thread.
+        """
+        sort = sort or self.DEFAULT_SORT
         search_text = search_text.lower()
-        query = (Attendance.select(
-            Attendance.id,
-            Attendance.timestamp,
-            User.name,
-            Attendance.status,
-            Attendance.punch,
-            Attendance.uid,
-            Attendance.user
-        )
-                 .join(User, on=(Attendance.user == User.uid))
-                 .order_by(Attendance.timestamp.desc()))
-
+        # Every punch has a user, so matches are counted without the join
+        query, count_query = self.query(), Attendance.select()
         if search_text:
-            query = query.where(
-                (User.name.contains(search_text)) |
-                (Attendance.status.contains(search_text)) |
-                (Attendance.punch.contains(search_text))
-            )
+            page_condition, count_condition = search_attendance(search_text)
+            query, count_query = query.where(page_condition), count_query.where(count_condition)
 
         if date_filter:
-            query = query.where(Attendance.timestamp >= date_filter[0], Attendance.timestamp <= date_filter[1])
+            in_range = (Attendance.timestamp >= date_filter[0]) & (Attendance.timestamp <= date_filter[1])
+            query, count_query = query.where(in_range), count_query.where(in_range)
+
+        key, descending = sort
+        pager = KeysetPager(self.SORT_KEYS[key], self.page_size, descending=descending)
+        # Unfiltered totals come from the maintained row counter
+        pager.reset(query, None if search_text or date_filter else Attendance, count_query)
+        return search_text, date_filter, sort, pager
+
+    def apply_search(self, result):
+        self.search_text, self.date_filter, self.sort, self.pager = result
+
+    def jump_to_date(self, date):
+        """Start the pager at the punches on date, sorting by timestamp first if the list is sorted otherwise."""
+        if self.sort[0] != "timestamp":
+            self.apply_search(self.search(self.search_text, self.date_filter, self.DEFAULT_SORT))
+        descending = self.sort[1]
+        return self.pager.seek(datetime.datetime.combine(date, datetime.time.max if descending else datetime.time.min))
 
-        offset = (self.current_page - 1) * self.page_size
-        filtered_attendances = list(query.offset(offset).limit(self.page_size))
-        filtered_count = query.count()
-        return filtered_attendances, self.current_page, (filtered_count + self.page_size - 1) // self.page_size
+    def filter_attendance(self, search_text, date_filter=None, sort=None):
+        sort = sort or self.DEFAULT_SORT
+        if search_text.lower() != self.search_text or date_filter != self.date_filter or sort != self.sort:
+            self.apply_search(self.search(search_text, date_filter, sort))
+        return self.pager.rows
 
     def export_attendance(self, parent):
         try:
@@ -1,23 +1,43 @@
 from db.database import Device
+from utilities.pagination import KeysetPager
+from utilities.live_capture import live_capture
 
 class DeviceLogic:
+    # Orderings the list can be sorted by, each ending in a unique key; a few dozen devices sort fine without indexes
+    SORT_KEYS = {
+        "id": [Device.id],
+        "device_model": [Device.device_model, Device.id],
+        "ip_address": [Device.ip_address, Device.id],
+        "port": [Device.port, Device.id],
+        "status": [Device.status, Device.id],
+    }
+
     def __init__(self, page_size=100):
         self.page_size = page_size
-        self.current_page = 1
-        self.devices = []
-        self.total_count = 0
-        self.load_page(1)
-
-    def load_page(self, page):
-        self.current_page = page
-        offset = (page - 1) * self.page_size
-        self.devices = list(Device.select(
-            Device.id, Device.device_model, Device.ip_address, Device.port, Device.password
-        ).offset(offset).limit(self.page_size))
-        self.total_count = Device.select().count()
-
-    def get_page(self):
-        return self.devices, self.current_page, (self.total_count + self.page_size - 1) // self.page_size
+        self.apply_search(self.search(""))
+
+    def search(self, search_text, sort=None):
+        """Load the first page for this filter into a new pager and return it for apply_search().
+
+        sort is a (SORT_KEYS key, descending) pair; the default order is by ID. Leaves
+        the current pager untouched, so it can run on a worker thread.
+        """
+        search_text = search_text.lower()
+        query = Device.select(
+            Device.id, Device.device_model, Device.ip_address, Device.port, Device.password,
+            Device.status, Device.last_seen_at, Device.latency_ms
+        )
+        if search_text:
+            query = query.where(
+                (Device.ip_address.contains(search_text)) | (Device.device_model.contains(search_text))
+            )
+        key, descending = sort or ("id", False)
+        pager = KeysetPager(self.SORT_KEYS[key], self.page_size, descending=descending)
+        pager.reset(query, None if search_text else Device)
+        return search_text, sort, pager
+
+    def apply_search(self, result):
+        self.search_text, self.sort, self.pager = result
 
     def add_device(self, data):
         Device.create(
@@ -26,30 +46,52 @@ class DeviceLogic:
             password=data["Password"],
             device_model=data["Device Model"],
         )
-        self.load_page(self.current_page)
+        live_capture.reconcile()
 
     def edit_device(self, device_id, data):
         device = Device.get(Device.id == device_id)
+        if (device.ip_address, device.port) != (data["IP Address"], int(data["Port"])):
+            # Another terminal's log: the old sync watermark says nothing about it
+            device.last_record_count = 0
+            device.last_attendance_at = None
+            device.last_record_at = None
         device.ip_address = data["IP Address"]
         device.port = int(data["Port"])
         device.password = data["Password"]
         device.device_model = data["Device Model"]
+        # New connection details deserve a fresh chance, so close the circuit breaker
+        device.failure_count = 0
+        device.breaker_opened_at = None
         device.save()
-        self.load_page(self.current_page)
+        live_capture.reconcile()
+
+    def load_devices(self, device_ids):
+        """Full Device rows for device_ids; the list only loads the columns it shows."""
+        return list(Device.select().where(Device.id.in_(list(device_ids))))
+
+    def registered_addresses(self):
+        return {device.ip_address for device in Device.select(Device.ip_address)}
+
+    def add_discovered_devices(self, discovered):
+        """Create Device rows for hosts found by a Quick Scan; devices that need a comm key are saved with password 0."""
+        rows = [{
+            "ip_address": device.ip_address,
+            "port": device.port,
+            "password": "0",
+            "device_model": "ZK Device",
+            "status": "Online"
+        } for device in discovered]
+        if rows:
+            Device.insert_many(rows).execute()
+            live_capture.reconcile()
+        return len(rows)
 
     def delete_device(self, device_id):
         device = Device.get(Device.id == device_id)
         device.delete_instance()
-        self.load_page(self.current_page)
+        live_capture.reconcile()
 
-    def filter_devices(self, search_text):
-        search_text = search_text.lower()
-        query = Device.select(
-            Device.id, Device.device_model, Device.ip_address, Device.port, Device.password
-        ).where(
-            (Device.ip_address.contains(search_text)) | (Device.device_model.contains(search_text))
-        )
-        offset = (self.current_page - 1) * self.page_size
-        filtered_devices = list(query.offset(offset).limit(self.page_size))
-        filtered_count = query.count()
-        return filtered_devices, self.current_page, (filtered_count + self.page_size - 1) // self.page_size
\ No newline at end of file
+    def filter_devices(self, search_text, sort=None):
+        if search_text.lower() != self.search_text or sort != self.sort:
+            self.apply_search(self.search(search_text, sort))
+        return self.pager.rows
@@ -1,28 +1,56 @@
-from db.database import User
+from db.database import db, User, DeletedUser
+from utilities.pagination import KeysetPager
+from utilities.search import search_users
+from utilities.attendance_ingest import ingest_unmatched_attendance
 import pandas as pd
 
 class UserLogic:
+    # Orderings the list can be sorted by, each served by an index and ending in a unique key
+    SORT_KEYS = {
+        "uid": [User.uid],
+        "name": [User.name, User.uid],
+        "user_id": [User.user_id],
+    }
+
     def __init__(self, page_size=100):
         self.page_size = page_size
-        self.current_page = 1
-        self.users = []
-        self.total_count = 0
-        self.load_page(1)
+        self.apply_search(self.search("", "All Roles"))
+
+    def search(self, search_text, role_filter, sort=None):
+        """Load the first page for these filters into a new pager and return it for apply_search().
 
-    def load_page(self, page):
-        self.current_page = page
-        offset = (page - 1) * self.page_size
-        self.users = list(User.select(
+        sort is a (SORT_KEYS key, descending) pair; without one, search results come
+        best match first and the full list by UID. Leaves the current pager untouched,
+        so it can run on a worker thread.
+        """
+        search_text = search_text.lower()
+        query = User.select(
             User.uid, User.name, User.role, User.password, User.group_id, User.user_id, User.card, User.user_cloud_id
-        ).offset(offset).limit(self.page_size))
-        self.total_count = User.select().count()
+        )
+        key_fields = [User.uid]
+
+        if role_filter != "All Roles":
+            role_map = {"Admin": 1, "Manager": 2, "User": 3}
+            query = query.where(User.role == role_map[role_filter])
+
+        if search_text:
+            query, key_fields = search_users(query, search_text)
+
+        descending = False
+        if sort:
+            key, descending = sort
+            key_fields = self.SORT_KEYS[key]
 
-    def get_page(self):
-        return self.users, self.current_page, (self.total_count + self.page_size - 1) // self.page_size
+        pager = KeysetPager(key_fields, self.page_size, descending=descending)
+        pager.reset(query, None if search_text or role_filter != "All Roles" else User)
+        return search_text, role_filter, sort, pager
+
+    def apply_search(self, result):
+        self.search_text, self.role_filter, self.sort, self.pager = result
 
     def add_user(self, data):
         role_map = {"Admin": 1, "Manager": 2, "User": 3}
-        User.create(
+        user = User.create(
             uid=User.select().count() + 1,  # Simple UID generation
             name=data["Full Name"],
             role=role_map[data["Role"]],
@@ -31,7 +59,8 @@ class UserLogic:
             user_id=data["User ID"] or f"U{User.select().count() + 1:03d}",
             card=data["Card Number"] or None
         )
-        self.load_page(self.current_page)
+        ingest_unmatched_attendance()
+        return user.uid
 
     def edit_user(self, uid, data):
         role_map = {"Admin": 1, "Manager": 2, "User": 3}
@@ -43,35 +72,22 @@ class UserLogic:
         user.user_id = data["User ID"]
         user.card = data["Card Number"] or None
         user.save()
-        self.load_page(self.current_page)
 
     def delete_user(self, uid):
         user = User.get(User.uid == uid)
-        user.delete_instance()
-        self.load_page(self.current_page)
-
-    def filter_users(self, search_text, role_filter):
-        search_text = search_text.lower()
-        query = User.select(
-            User.uid, User.name, User.role, User.password, User.group_id, User.user_id, User.card, User.user_cloud_id
-        )
-
-        if search_text:
-            query = query.where(
-                (User.name.contains(search_text)) |
-                (User.user_id.contains(search_text))
-            )
-
-        if role_filter != "All Roles":
-            role_map = {"Admin": 1, "Manager": 2, "User": 3}
-            query = query.where(User.role == role_map[role_filter])
+        with db.atomic():
+            # Tombstone the user so a pruning push removes it from devices it was never synced off
+            DeletedUser.replace(user_id=user.user_id, uid=user.uid).execute()
+            user.delete_instance()
 
-        offset = (self.current_page - 1) * self.page_size
-        filtered_users = list(query.offset(offset).limit(self.page_size))
-        filtered_count = query.count()
-        return filtered_users, self.current_page, (filtered_count + self.page_size - 1) // self.page_size
+    def filter_users(self, search_text, role_filter, sort=None):
+        if search_text.lower() != self.search_text or role_filter != self.role_filter or sort != self.sort:
+            self.apply_search(self.search(search_text, role_filter, sort))
+        return self.pager.rows
 
     def import_users(self, parent):
+        """Import users from users_import.xlsx and return the UIDs that were created."""
+        imported_uids = []
         try:
             df = pd.read_excel("users_import.xlsx")
             for _, row in df.iterrows():
@@ -86,10 +102,13 @@ class UserLogic:
                     card=row["Card"] if pd.notna(row["Card"]) else None,
                     user_cloud_id=int(row["Cloud ID"]) if pd.notna(row["Cloud ID"]) else None
                 )
-            self.load_page(self.current_page)
+                imported_uids.append(int(row["UID"]))
             print("Users imported successfully")
         except Exception as e:
             print(f"Error importing users: {e}")
+        if imported_uids:
+            ingest_unmatched_attendance()
+        return imported_uids
 
     def export_users(self, parent):
         try:
@@ -1,5 +1,5 @@
 import sys
-from db.database import init_db, Device, User, Attendance
+from db.database import db, init_db, Device, User, Attendance
 
 from PySide6.QtWidgets import QApplication, QMainWindow, QHBoxLayout, QWidget, QVBoxLayout, QPushButton, QLabel, QStackedWidget
 from PySide6.QtCore import Qt
@@ -12,6 +12,10 @@ from ui.dashboard_ui import DashboardScreen
 from ui.developer_credits import DeveloperCreditsDialog  # Import the new dialog
 import datetime
 from utilities.logger import logger
+from utilities.device_health import health_monitor
+from utilities.device_pool import device_pool
+from utilities.live_capture import live_capture
+from utilities.state_manager import state_manager
 
 class PrimeSyncApp(QMainWindow):
     def __init__(self):
@@ -171,6 +175,13 @@ class PrimeSyncApp(QMainWindow):
 if __name__ == "__main__":
     init_db()
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(device_pool.close_all)
+    app.aboutToQuit.connect(lambda: live_capture.stop(wait=True))  # Write buffered punches before exiting
+    app.aboutToQuit.connect(health_monitor.stop)
+    app.aboutToQuit.connect(db.close_all)
+    health_monitor.start()
+    live_capture.apply_settings(state_manager.settings)
+    state_manager.settings_changed.connect(live_capture.apply_settings)
     window = PrimeSyncApp()
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""Local stand-in for the PrimeSync cloud API.
+
+Implements POST {base}/attendance the way CloudSync uses it: gzip or plain bodies,
+NDJSON or a JSON array, chunked or Content-Length framing, and Idempotency-Key
+replay detection. GET {base}/users serves a generated user directory with cursor
+paging and updated_since filtering for CloudUserReconciler. Latency, error rate and
+payload limits are configurable so sync behaviour can be measured without
+api.primesync.com.
+
+    python -m tools.mock_cloud_server --port 8080 --latency 0.05 --error-rate 0.1
+
+then point the Cloud API URL setting at http://127.0.0.1:8080/v1. GET {base}/stats
+returns the counters as JSON.
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+
+
+class MockCloudState:
+    """Stored records, seen idempotency keys, counters and failure-injection settings."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, max_payload_bytes=0, max_records=0, users=0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_payload_bytes = max_payload_bytes
+        self.max_records = max_records
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.records = {}  # attendance id -> record
+        self.idempotency_keys = set()
+        self.users = [self.directory_entry(uid) for uid in range(1, users + 1)]  # Sorted by id
+        self.stats = {"requests": 0, "accepted": 0, "replayed": 0, "errors": 0, "rejected": 0,
+                      "bytes_received": 0, "records_received": 0, "duplicate_records": 0}
+
+    @staticmethod
+    def directory_entry(uid, updated_at="2025-01-01T00:00:00"):
+        return {"id": 100000 + uid, "user_id": f"U{uid:03d}", "card": str(5000000 + uid), "updated_at": updated_at}
+
+    def directory_page(self, cursor=0, page_size=1000, updated_since=None):
+        """Return (entries, next_cursor); the cursor is an index into the id-sorted directory."""
+        with self.lock:
+            matching = [user for user in self.users if not updated_since or user["updated_at"] >= updated_since]
+        page = matching[cursor:cursor + page_size]
+        next_cursor = cursor + page_size if cursor + page_size < len(matching) else None
+        return page, next_cursor
+
+    def count(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, records_stored=len(self.records))
+
+
+class MockCloudHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        state = self.server.state
+        if path.rstrip("/").endswith("/stats"):
+            self.respond(200, state.snapshot())
+        elif path.rstrip("/").endswith("/users"):
+            state.count(requests=1)
+            if state.latency:
+                time.sleep(state.latency)
+            users, next_cursor = state.directory_page(int(params.get("cursor", 0)), int(params.get("page_size", 1000)),
+                                                      params.get("updated_since"))
+            self.respond(200, {"users": users, "next_cursor": next_cursor})
+        else:
+            self.respond(404, {"error": "Not found"})
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.read_body()
+        state.count(requests=1, bytes_received=len(body))
+        if not self.path.rstrip("/").endswith("/attendance"):
+            self.respond(404, {"error": "Not found"})
+            return
+        if state.latency:
+            time.sleep(state.latency)
+        if state.error_rate and state.random.random() < state.error_rate:
+            state.count(errors=1)
+            self.respond(503, {"error": "Injected failure"})
+            return
+
+        try:
+            if self.headers.get("Content-Encoding", "").lower() == "gzip":
+                body = zlib.decompress(body, 47)  # 47: accept gzip or zlib headers
+            if state.max_payload_bytes and len(body) > state.max_payload_bytes:
+                state.count(rejected=1)
+                self.respond(413, {"error": f"Payload exceeds {state.max_payload_bytes} bytes"})
+                return
+            text = body.decode()
+            if text.lstrip().startswith("["):
+                records = json.loads(text)
+            else:
+                records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except (ValueError, zlib.error) as e:
+            state.count(rejected=1)
+            self.respond(400, {"error": f"Malformed body: {e}"})
+            return
+        if state.max_records and len(records) > state.max_records:
+            state.count(rejected=1)
+            self.respond(413, {"error": f"More than {state.max_records} records"})
+            return
+
+        key = self.headers.get("Idempotency-Key")
+        with state.lock:
+            if key and key in state.idempotency_keys:
+                state.stats["replayed"] += 1
+                replay = True
+            else:
+                replay = False
+                if key:
+                    state.idempotency_keys.add(key)
+                state.stats["accepted"] += 1
+                state.stats["records_received"] += len(records)
+                for record in records:
+                    if record.get("id") in state.records:
+                        state.stats["duplicate_records"] += 1
+                    state.records[record.get("id")] = record
+        self.respond(200, {"accepted": len(records), "replayed": replay})
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if not size:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass  # Trailers
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def respond(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockCloudServer(ThreadingHTTPServer):
+    """HTTP server backed by a MockCloudState; port 0 picks a free port."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, state=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), MockCloudHandler)
+        self.state = state or MockCloudState()
+        self._thread = None
+
+    @property
+    def api_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-cloud", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the PrimeSync cloud API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added before every reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of POSTs answered with HTTP 503")
+    parser.add_argument("--max-payload-bytes", type=int, default=0, help="Reject larger decompressed bodies (0: no limit)")
+    parser.add_argument("--max-records", type=int, default=0, help="Reject requests with more records (0: no limit)")
+    parser.add_argument("--users", type=int, default=0, help="Cloud directory size (user IDs U001, U002, ...)")
+    args = parser.parse_args()
+
+    state = MockCloudState(latency=args.latency, error_rate=args.error_rate, max_payload_bytes=args.max_payload_bytes,
+                           max_records=args.max_records, users=args.users)
+    server = MockCloudServer(state, host=args.host, port=args.port).start()
+    print(f"Mock cloud API listening on {server.api_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Localhost simulator for ZK attendance terminals.
+
+Speaks enough of the ZK TCP protocol for pyzk's connect (with optional comm-key
+authentication), get_users, set_user, delete_user, get_attendance and get_time, so
+DeviceManager can be exercised and benchmarked without physical hardware.
+
+Run a fleet from the command line:
+
+    python -m tools.zk_simulator --devices 100 --users 3000 --records 100000
+
+or start one from code with SimulatorFleet / ZKSimulatorServer.
+"""
+from struct import pack, unpack
+from zk import const
+from zk.base import make_commkey
+import argparse
+import datetime
+import random
+import socketserver
+import threading
+import time
+from utilities.device_discovery import zk_packet
+
+HEADER_SIZE = 8
+USER_PACKET = "<HB8s24sIx7sx24s"  # 72-byte ZK8 user record
+ATTENDANCE_PACKET = "<H24sB4sB8s"  # 40-byte attendance record
+CMD_PREPARE_BUFFER = 1503
+
+
+def encode_time(t):
+    """Encode a datetime the way the terminal stores it (zkemsdk EncodeTime)."""
+    return (((t.year % 100) * 12 * 31 + ((t.month - 1) * 31) + t.day - 1) * (24 * 60 * 60)
+            + (t.hour * 60 + t.minute) * 60 + t.second)
+
+
+class SimulatedDevice:
+    """In-memory state of one terminal plus its failure-injection settings."""
+
+    def __init__(self, users=100, records=1000, password=0, latency=0.0, packet_loss=0.0,
+                 error_rate=0.0, offline=False, seed=None):
+        self.password = password
+        self.latency = latency
+        self.packet_loss = packet_loss
+        self.error_rate = error_rate
+        self.offline = offline
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.users = {}  # device uid -> dict
+        for uid in range(1, users + 1):
+            self.users[uid] = {"uid": uid, "privilege": const.USER_DEFAULT, "password": "",
+                               "name": f"Sim User {uid}", "card": 0, "group_id": "1", "user_id": str(uid)}
+        self.attendance = []  # (user_id, timestamp, status, punch)
+        start = datetime.datetime(2025, 1, 1, 8, 0, 0)
+        for i in range(records):
+            user_id = str(self.random.randint(1, max(users, 1)))
+            self.attendance.append((user_id, start + datetime.timedelta(seconds=37 * i), 1, i % 2))
+
+    def add_punch(self, user_id, timestamp=None, punch=0):
+        with self.lock:
+            self.attendance.append((str(user_id), timestamp or datetime.datetime.now().replace(microsecond=0), 1, punch))
+
+    def free_sizes(self):
+        fields = [0] * 20
+        fields[4] = len(self.users)
+        fields[8] = len(self.attendance)
+        fields[14], fields[15], fields[16] = 3000, 10000, 100000
+        fields[17] = fields[14]
+        fields[18] = fields[15] - len(self.users)
+        fields[19] = fields[16] - len(self.attendance)
+        return pack("20i", *fields) + pack("3i", 0, 0, 0)
+
+    def user_data(self):
+        with self.lock:
+            users = list(self.users.values())
+        body = b"".join(
+            pack(USER_PACKET, user["uid"], user["privilege"], user["password"].encode()[:8],
+                 user["name"].encode()[:24], user["card"], user["group_id"].encode()[:7],
+                 user["user_id"].encode()[:24])
+            for user in users
+        )
+        return pack("I", len(body)) + body
+
+    def attendance_data(self):
+        with self.lock:
+            records = list(self.attendance)
+        uids = {user["user_id"]: user["uid"] for user in self.users.values()}
+        body = b"".join(
+            pack(ATTENDANCE_PACKET, uids.get(user_id, 0), user_id.encode()[:24], status,
+                 pack("<I", encode_time(timestamp)), punch, b"\x00" * 8)
+            for user_id, timestamp, status, punch in records
+        )
+        return pack("I", len(body)) + body
+
+    def set_user(self, data):
+        uid, privilege, password, name, card, group_id, user_id = unpack("<HB8s24s4sx7sx24s", data[:72].ljust(72, b"\x00"))
+        with self.lock:
+            self.users[uid] = {
+                "uid": uid,
+                "privilege": privilege,
+                "password": password.split(b"\x00")[0].decode(errors="ignore"),
+                "name": name.split(b"\x00")[0].decode(errors="ignore"),
+                "card": unpack("<I", card)[0],
+                "group_id": group_id.split(b"\x00")[0].decode(errors="ignore"),
+                "user_id": user_id.split(b"\x00")[0].decode(errors="ignore")
+            }
+
+    def delete_user(self, data):
+        (uid,) = unpack("h", data[:2])
+        with self.lock:
+            return self.users.pop(uid, None) is not None
+
+
+class ZKRequestHandler(socketserver.BaseRequestHandler):
+    """Serve one client connection against the server's SimulatedDevice."""
+
+    def setup(self):
+        self.device = self.server.device
+        self.session_id = self.server.next_session_id()
+        self.authenticated = not self.device.password
+
+    def handle(self):
+        while True:
+            packet = self.read_packet()
+            if packet is None:
+                return
+            if self.device.offline:
+                continue  # Accept the connection but never answer, like a hung terminal
+            command, _, _, reply_id = unpack("<4H", packet[:HEADER_SIZE])
+            data = packet[HEADER_SIZE:]
+            if self.device.latency:
+                time.sleep(self.device.latency)
+            if self.device.packet_loss and self.device.random.random() < self.device.packet_loss:
+                continue  # Drop the reply; the client times out
+            if (self.device.error_rate and command not in (const.CMD_CONNECT, const.CMD_AUTH, const.CMD_EXIT)
+                    and self.device.random.random() < self.device.error_rate):
+                self.reply(const.CMD_ACK_ERROR, reply_id)
+                continue
+            if not self.dispatch(command, data, reply_id):
+                return
+
+    def dispatch(self, command, data, reply_id):
+        """Answer one command; returns False when the session should end."""
+        if command == const.CMD_CONNECT:
+            self.reply(const.CMD_ACK_OK if self.authenticated else const.CMD_ACK_UNAUTH, reply_id)
+        elif command == const.CMD_AUTH:
+            self.authenticated = data[:4] == make_commkey(self.device.password, self.session_id)
+            self.reply(const.CMD_ACK_OK if self.authenticated else const.CMD_ACK_UNAUTH, reply_id)
+        elif not self.authenticated:
+            self.reply(const.CMD_ACK_UNAUTH, reply_id)
+        elif command == const.CMD_EXIT:
+            self.reply(const.CMD_ACK_OK, reply_id)
+            return False
+        elif command == const.CMD_GET_FREE_SIZES:
+            self.reply(const.CMD_ACK_OK, reply_id, self.device.free_sizes())
+        elif command == const.CMD_GET_TIME:
+            self.reply(const.CMD_ACK_OK, reply_id, pack("<I", encode_time(datetime.datetime.now())))
+        elif command == CMD_PREPARE_BUFFER:
+            _, inner, _, _ = unpack("<bhii", data[:11])
+            if inner == const.CMD_USERTEMP_RRQ:
+                self.reply(const.CMD_DATA, reply_id, self.device.user_data())
+            elif inner == const.CMD_ATTLOG_RRQ:
+                self.reply(const.CMD_DATA, reply_id, self.device.attendance_data())
+            else:
+                self.reply(const.CMD_ACK_ERROR, reply_id)
+        elif command == const.CMD_USER_WRQ:
+            self.device.set_user(data)
+            self.reply(const.CMD_ACK_OK, reply_id)
+        elif command == const.CMD_DELETE_USER:
+            self.reply(const.CMD_ACK_OK if self.device.delete_user(data) else const.CMD_ACK_ERROR, reply_id)
+        elif command in (const.CMD_REFRESHDATA, const.CMD_FREE_DATA, const.CMD_ENABLEDEVICE,
+                         const.CMD_DISABLEDEVICE, const.CMD_CANCELCAPTURE, const.CMD_STARTVERIFY,
+                         const.CMD_REG_EVENT):
+            self.reply(const.CMD_ACK_OK, reply_id)
+        else:
+            self.reply(const.CMD_ACK_UNKNOWN, reply_id)
+        return True
+
+    def read_packet(self):
+        top = self.recv_exactly(8)
+        if top is None:
+            return None
+        magic_1, magic_2, length = unpack("<HHI", top)
+        if (magic_1, magic_2) != (const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2):
+            return None
+        return self.recv_exactly(length)
+
+    def recv_exactly(self, size):
+        chunks = []
+        while size:
+            try:
+                chunk = self.request.recv(size)
+            except OSError:
+                return None
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def reply(self, code, reply_id, data=b""):
+        self.request.sendall(zk_packet(code, self.session_id, reply_id, data))
+
+
+class ZKSimulatorServer(socketserver.ThreadingTCPServer):
+    """A TCP server that behaves like one ZK terminal."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, device, host="127.0.0.1", port=4370):
+        super().__init__((host, port), ZKRequestHandler)
+        self.device = device
+        self._session_lock = threading.Lock()
+        self._session_id = 0
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def next_session_id(self):
+        with self._session_lock:
+            self._session_id = self._session_id % 0xFFFF + 1
+            return self._session_id
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name=f"zk-sim-{self.port}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SimulatorFleet:
+    """Start many simulated devices on consecutive ports (port 0 picks free ports)."""
+
+    def __init__(self, count, host="127.0.0.1", base_port=0, **device_options):
+        self.servers = []
+        for index in range(count):
+            port = base_port + index if base_port else 0
+            device = SimulatedDevice(seed=index, **device_options)
+            self.servers.append(ZKSimulatorServer(device, host=host, port=port).start())
+
+    @property
+    def addresses(self):
+        return [server.server_address for server in self.servers]
+
+    def stop(self):
+        for server in self.servers:
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run simulated ZK attendance terminals on localhost")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=4370)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--password", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added before every reply")
+    parser.add_argument("--packet-loss", type=float, default=0.0, help="Fraction of replies silently dropped")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of commands answered with an error")
+    parser.add_argument("--offline", type=int, default=0, help="Number of devices that accept but never answer")
+    args = parser.parse_args()
+
+    fleet = SimulatorFleet(args.devices, host=args.host, base_port=args.base_port, users=args.users,
+                           records=args.records, password=args.password, latency=args.latency,
+                           packet_loss=args.packet_loss, error_rate=args.error_rate)
+    for server in fleet.servers[:args.offline]:
+        server.device.offline = True
+    for host, port in fleet.addresses:
+        print(f"Simulated device listening on {host}:{port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fleet.stop()
+
+
+if __name__ == "__main__":
+    main()
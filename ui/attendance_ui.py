@@ -2,12 +2,18 @@ from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QL
 from PySide6.QtGui import QIcon
 from PySide6.QtCore import QDate
 from logic.attendance_logic import AttendanceLogic
-from ui.components.table_widget import PaginatedTableWidget
+from ui.components.table_widget import LazyTableWidget
+from ui.components.search_controller import SearchController
+from ui.error_dialog import ErrorDialog
+import datetime
 
 class AttendanceScreen(QWidget):
     def __init__(self):
         super().__init__()
-        self.logic = AttendanceLogic(page_size=10)
+        self.logic = AttendanceLogic()
+        self.search = SearchController(self.logic.search, parent=self)
+        self.search.results_ready.connect(self.on_search_finished)
+        self.search.failed.connect(self.on_search_failed)
         self.init_ui()
 
     def init_ui(self):
@@ -64,46 +70,54 @@ class AttendanceScreen(QWidget):
         search_filter_layout.addWidget(self.start_date)
         search_filter_layout.addWidget(QLabel("To:"))
         search_filter_layout.addWidget(self.end_date)
+
+        self.jump_date = QDateEdit()
+        self.jump_date.setCalendarPopup(True)
+        self.jump_date.setDate(QDate.currentDate())
+        self.jump_date.setStyleSheet("border-radius: 5px; padding: 5px;")
+        jump_button = QPushButton("Go")
+        jump_button.setStyleSheet("border-radius: 5px; padding: 5px;")
+        jump_button.clicked.connect(self.jump_to_date)
+
+        search_filter_layout.addWidget(QLabel("Go to:"))
+        search_filter_layout.addWidget(self.jump_date)
+        search_filter_layout.addWidget(jump_button)
         layout.addLayout(search_filter_layout)
 
         # Table
-        attendances, _, total_pages = self.logic.get_page()
-        self.table_data = [[a.id, a.timestamp, a.user, a.status, a.punch, a.uid] for a in attendances]
-        self.table = PaginatedTableWidget(
+        self.table = LazyTableWidget(
             ["ID", "Timestamp", "User", "Status", "Punch", "UID"],
-            self.table_data,
-            page_size=10
+            lambda a: [a.id, a.timestamp, a.user_name, a.status, a.punch, a.uid],
+            sort_keys={"ID": "id", "Timestamp": "timestamp", "User": "user", "UID": "uid"}
         )
-        self.table.prev_button.clicked.disconnect()
-        self.table.next_button.clicked.disconnect()
-        self.table.prev_button.clicked.connect(self.prev_page)
-        self.table.next_button.clicked.connect(self.next_page)
+        self.table.show_sort(self.logic.sort)
+        self.table.sort_changed.connect(self.sort_attendance)
+        self.table.set_pager(self.logic.pager)
         layout.addWidget(self.table)
 
-    def prev_page(self):
-        if self.logic.current_page > 1:
-            self.logic.load_page(self.logic.current_page - 1)
-            self.filter_attendance()
-
-    def next_page(self):
-        attendances, _, total_pages = self.logic.get_page()
-        if self.logic.current_page < total_pages:
-            self.logic.load_page(self.logic.current_page + 1)
-            self.filter_attendance()
+    def jump_to_date(self):
+        self.logic.jump_to_date(self.jump_date.date().toPython())
+        self.table.show_sort(self.logic.sort)
+        self.table.set_pager(self.logic.pager)
 
     def filter_attendance(self):
         search_text = self.search_bar.text()
-        start_date = self.start_date.date().toPython()
-        end_date = self.end_date.date().toPython().replace(hour=23, minute=59, second=59)
-        date_filter = (start_date, end_date) if start_date and end_date else None
-
-        if search_text or date_filter:
-            filtered_attendances, _, total_pages = self.logic.filter_attendance(search_text, date_filter)
-        else:
-            filtered_attendances, _, total_pages = self.logic.get_page()
-
-        self.table_data = [[a.id, a.timestamp, a.user, a.status, a.punch, a.uid] for a in filtered_attendances]
-        self.table.set_data(self.table_data, total_pages)
+        start_date = datetime.datetime.combine(self.start_date.date().toPython(), datetime.time.min)
+        end_date = datetime.datetime.combine(self.end_date.date().toPython(), datetime.time(23, 59, 59))
+        self.search.request(search_text, (start_date, end_date), self.table.sort)
+
+    def sort_attendance(self):
+        # Keep the filters in effect and reorder right away, without the typing delay
+        self.search.request(self.logic.search_text, self.logic.date_filter, self.table.sort)
+        self.search.run()
+
+    def on_search_finished(self, result):
+        self.logic.apply_search(result)
+        self.table.set_pager(self.logic.pager)
+
+    def on_search_failed(self, error):
+        error_dialog = ErrorDialog(f"Error searching attendance: {error}")
+        error_dialog.exec()
 
     def export_attendance(self):
         self.logic.export_attendance(self)
\ No newline at end of file
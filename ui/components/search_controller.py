@@ -0,0 +1,96 @@
+from PySide6.QtCore import QObject, QTimer, Signal
+from peewee import OperationalError
+import threading
+from db.database import db
+from utilities.background_task import BackgroundTask
+from utilities.constants import SEARCH_DEBOUNCE_MS
+
+
+class SearchQuery:
+    """One search run on a worker thread; cancel() interrupts its SQLite statement."""
+
+    def __init__(self, search_fn, args):
+        self.search_fn = search_fn
+        self.args = args
+        self.cancelled = False
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        with db.connection_context():
+            # The connection is only exposed while this search owns it, so cancel() can
+            # never interrupt a statement of whichever thread reuses it from the pool
+            with self._lock:
+                if self.cancelled:
+                    return None
+                self._connection = db.connection()
+            try:
+                return self.search_fn(*self.args)
+            except OperationalError:
+                if self.cancelled:
+                    return None  # Interrupted
+                raise
+            finally:
+                with self._lock:
+                    self._connection = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._connection is not None:
+                self._connection.interrupt()
+
+
+class SearchController(QObject):
+    """Debounce a list screen's search inputs and run the search off the UI thread.
+
+    Every request() restarts a short timer; when it fires, search_fn runs on a
+    BackgroundTask with the latest arguments. Starting a search cancels the one in
+    flight, interrupting its SQLite statement, and only the newest search's result is
+    emitted, so a slow early keystroke can never overwrite a later one.
+    """
+    results_ready = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, search_fn, delay_ms=SEARCH_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self.search_fn = search_fn
+        self._args = ()
+        self._current = None  # SearchQuery whose result will be shown
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.run)
+
+    def request(self, *args):
+        self._args = args
+        self._timer.start()
+
+    def run(self):
+        """Start the requested search now."""
+        self._timer.stop()
+        self.cancel()
+        query = SearchQuery(self.search_fn, self._args)
+        self._current = query
+        # Parented to the controller so Qt keeps the thread alive until it has fully stopped
+        task = BackgroundTask(query.run, parent=self)
+        task.succeeded.connect(lambda result: self._on_finished(query, result))
+        task.failed.connect(lambda error: self._on_failed(query, error))
+        task.finished.connect(task.deleteLater)
+        task.start()
+
+    def cancel(self):
+        """Drop the search in flight, if any; a pending request still runs when its timer fires."""
+        if self._current is not None:
+            self._current.cancel()
+            self._current = None
+
+    def _on_finished(self, query, result):
+        if query is self._current:
+            self._current = None
+            self.results_ready.emit(result)
+
+    def _on_failed(self, query, error):
+        if query is self._current:
+            self._current = None
+            self.failed.emit(error)
@@ -1,16 +1,229 @@
-from PySide6.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView, QHBoxLayout, QWidget, QPushButton, QVBoxLayout, QLabel
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import (QTableView, QHeaderView, QWidget, QVBoxLayout, QLabel, QStyledItemDelegate,
+                               QAbstractItemView)
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, QRect, Signal
+from PySide6.QtGui import QIcon, QColor, QPainter
 
-class PaginatedTableWidget(QWidget):
-    def __init__(self, columns, data, page_size=100, actions=None):
+TABLE_MAX_ROWS = 2000  # Rows a table keeps loaded; pages scrolled far out of view are dropped
+ACTION_BUTTON_SIZE = 24  # Edge of a painted row action button, in pixels
+ACTION_BUTTON_SPACING = 4  # Gap around row action buttons, in pixels
+ACTION_COLORS = {
+    "edit": "#4682b4",
+    "delete": "#ff4040",
+    "connect": "#32cd32",
+    "disconnect": "#ff8c00",
+    "restart": "#1e90ff"
+}
+
+
+class LazyTableModel(QAbstractTableModel):
+    """Table model over a window of a KeysetPager's rows.
+
+    The window starts as the pager's block and grows a page at a time: Qt asks for
+    the next page through canFetchMore/fetchMore when the view is scrolled to the
+    bottom, and fetch_earlier() reads the page above the first row. Once more than
+    max_rows are loaded, pages at the opposite end are dropped again, so memory stays
+    bounded however far the user scrolls. row_fn turns a record into its cell values,
+    which are formatted once when the page arrives.
+    """
+
+    def __init__(self, columns, row_fn, has_actions=False, max_rows=TABLE_MAX_ROWS, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.row_fn = row_fn
+        self.has_actions = has_actions
+        self.max_rows = max_rows
+        self.pager = None
+        self.records = []
+        self.cells = []
+        self.has_prev = self.has_next = False
+
+    def set_pager(self, pager):
+        """Show pager's current block, replacing whatever was loaded."""
+        self.beginResetModel()
+        self.pager = pager
+        self.records = list(pager.rows)
+        self.cells = [self.format(record) for record in self.records]
+        self.has_prev, self.has_next = pager.has_prev, pager.has_next
+        self.endResetModel()
+
+    def refresh(self):
+        """Re-read the loaded rows in place, e.g. after rows were added, edited or deleted."""
+        if self.pager is None:
+            return
+        start = self.records[0] if self.records else None
+        records = self.pager.reload(start, max(len(self.records), self.pager.page_size))
+        cells = [self.format(record) for record in records]
+        old_count, new_count = len(self.records), len(records)
+        if new_count < old_count:
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            self.records, self.cells = records, cells
+            self.endRemoveRows()
+        elif new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self.records, self.cells = records, cells
+            self.endInsertRows()
+        else:
+            self.records, self.cells = records, cells
+        self.has_prev, self.has_next = self.pager.has_prev, self.pager.has_next
+        if new_count:
+            self.dataChanged.emit(self.index(0, 0), self.index(new_count - 1, self.columnCount() - 1))
+
+    def format(self, record):
+        return tuple(str(value) for value in self.row_fn(record))
+
+    def record(self, row):
+        return self.records[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns) + (1 if self.has_actions else 0)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation != Qt.Horizontal or role != Qt.DisplayRole:
+            return None
+        return self.columns[section] if section < len(self.columns) else "Actions"
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.column() >= len(self.columns):
+            return None
+        value = self.cells[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            return value
+        if role == Qt.ForegroundRole:
+            col = index.column()
+            if col == 2 and "punch" in self.columns[col].lower():  # Highlight punch column
+                return QColor(Qt.green if value == "IN" else Qt.red)
+            if col == 4 and "status" in self.columns[col].lower():  # Highlight status column
+                return QColor(Qt.green if value == "Online" else Qt.red)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_next and bool(self.records)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        records, self.has_next = self.pager.after(self.records[-1])
+        if records:
+            start = len(self.records)
+            self.beginInsertRows(QModelIndex(), start, start + len(records) - 1)
+            self.records.extend(records)
+            self.cells.extend(self.format(record) for record in records)
+            self.endInsertRows()
+        excess = len(self.records) - self.max_rows
+        if excess > 0:
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            del self.records[:excess], self.cells[:excess]
+            self.endRemoveRows()
+            self.has_prev = True
+
+    def fetch_earlier(self):
+        """Load the page above the first row; returns how many rows were inserted at the top."""
+        if not self.has_prev or not self.records:
+            return 0
+        records, self.has_prev = self.pager.before(self.records[0])
+        if records:
+            self.beginInsertRows(QModelIndex(), 0, len(records) - 1)
+            self.records[:0] = records
+            self.cells[:0] = [self.format(record) for record in records]
+            self.endInsertRows()
+        excess = len(self.records) - self.max_rows
+        if excess > 0:
+            self.beginRemoveRows(QModelIndex(), self.max_rows, len(self.records) - 1)
+            del self.records[self.max_rows:], self.cells[self.max_rows:]
+            self.endRemoveRows()
+            self.has_next = True
+        return len(records)
+
+
+class ActionDelegate(QStyledItemDelegate):
+    """Paints a row's action buttons and runs their callbacks on click, without a widget per row."""
+
+    def __init__(self, actions, parent=None):
+        super().__init__(parent)
+        self.actions = [(name, QIcon(icon), callback) for name, icon, callback in actions]
+
+    def button_rects(self, rect):
+        size = min(ACTION_BUTTON_SIZE, rect.height() - 2 * ACTION_BUTTON_SPACING)
+        top = rect.top() + (rect.height() - size) // 2
+        return [QRect(rect.left() + ACTION_BUTTON_SPACING + i * (size + ACTION_BUTTON_SPACING), top, size, size)
+                for i in range(len(self.actions))]
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)  # Background and selection only; the column has no text
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        for (name, icon, _), rect in zip(self.actions, self.button_rects(option.rect)):
+            painter.setBrush(QColor(ACTION_COLORS.get(name.lower(), "#4682b4")))
+            painter.drawRoundedRect(rect, 5, 5)
+            icon.paint(painter, rect.adjusted(2, 2, -2, -2))
+        painter.restore()
+
+    def width(self):
+        return len(self.actions) * (ACTION_BUTTON_SIZE + ACTION_BUTTON_SPACING) + ACTION_BUTTON_SPACING
+
+    def sizeHint(self, option, index):
+        hint = super().sizeHint(option, index)
+        hint.setWidth(self.width())
+        return hint
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            for (_, _, callback), rect in zip(self.actions, self.button_rects(option.rect)):
+                if rect.contains(event.position().toPoint()):
+                    callback(index.row())
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+
+class LazyTableView(QTableView):
+    """QTableView that keeps the rows on screen still while a LazyTableModel loads or drops rows above them."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerItem)
+        self.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.rowsRemoved.connect(self.on_rows_removed)
+
+    def rowsInserted(self, parent, start, end):
+        super().rowsInserted(parent, start, end)
+        if start == 0:
+            self.updateGeometries()
+            scroll_bar = self.verticalScrollBar()
+            scroll_bar.setValue(scroll_bar.value() + end + 1)
+
+    def on_rows_removed(self, parent, start, end):
+        if start == 0:
+            scroll_bar = self.verticalScrollBar()
+            scroll_bar.setValue(max(0, scroll_bar.value() - (end + 1)))
+
+    def on_scrolled(self, value):
+        if value == self.verticalScrollBar().minimum():
+            self.model().fetch_earlier()
+
+
+class LazyTableWidget(QWidget):
+    """Lazily loaded table with painted row actions.
+
+    Header clicks on the columns named in sort_keys (column -> sort key) do not sort
+    the loaded rows: they set sort to (key, descending) and emit sort_changed, so the
+    screen can reload the list ordered by the database. Other columns do not sort.
+    """
+    sort_changed = Signal()
+
+    def __init__(self, columns, row_fn, actions=None, sort_keys=None, max_rows=TABLE_MAX_ROWS):
         super().__init__()
         self.columns = columns
-        self.data = data  # List of rows, where each row is a list of values
         self.actions = actions or []
-        self.page_size = page_size
-        self.current_page = 1
-        self.total_pages = (len(self.data) + self.page_size - 1) // self.page_size
+        self.sort_keys = sort_keys or {}
+        self.sort = None
+        self.model = LazyTableModel(columns, row_fn, bool(self.actions), max_rows, self)
 
         self.init_ui()
 
@@ -18,94 +231,59 @@ class PaginatedTableWidget(QWidget):
         layout = QVBoxLayout(self)
 
         # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(len(self.columns) + (1 if self.actions else 0))
-        headers = self.columns + (["Actions"] if self.actions else [])
-        self.table.setHorizontalHeaderLabels(headers)
+        self.table = LazyTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.horizontalHeader().sectionClicked.connect(self.sort_by_column)
-
-        # Pagination Controls
-        pagination_layout = QHBoxLayout()
-        self.prev_button = QPushButton("Previous")
-        self.prev_button.clicked.connect(self.prev_page)
-        self.next_button = QPushButton("Next")
-        self.next_button.clicked.connect(self.next_page)
-        self.page_label = QLabel(f"Page {self.current_page} of {self.total_pages}")
-
-        pagination_layout.addWidget(self.prev_button)
-        pagination_layout.addWidget(self.next_button)
-        pagination_layout.addWidget(self.page_label)
-        pagination_layout.addStretch()
-
-        self.update_table()
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        if self.actions:
+            delegate = ActionDelegate(self.actions, self.table)
+            self.table.setItemDelegateForColumn(len(self.columns), delegate)
+            self.table.horizontalHeader().setSectionResizeMode(len(self.columns), QHeaderView.Fixed)
+            self.table.horizontalHeader().resizeSection(len(self.columns), delegate.width())
+        if self.sort_keys:
+            self.table.horizontalHeader().setSortIndicatorShown(True)
+            self.table.horizontalHeader().sortIndicatorChanged.connect(self.on_sort_indicator_changed)
+        self.show_sort(None)
+
+        self.count_label = QLabel()
+
         layout.addWidget(self.table)
-        layout.addLayout(pagination_layout)
-
-    def update_table(self):
-        start_idx = (self.current_page - 1) * self.page_size
-        end_idx = min(start_idx + self.page_size, len(self.data))
-        page_data = self.data[start_idx:end_idx]
-
-        self.table.setRowCount(len(page_data))
-        for row, item in enumerate(page_data):
-            for col, value in enumerate(item[:-1]):  # Exclude actions column data
-                table_item = QTableWidgetItem(str(value))
-                if col == 2 and "punch" in self.columns[col].lower():  # Highlight punch column
-                    table_item.setForeground(Qt.green if value == "IN" else Qt.red)
-                elif col == 4 and "status" in self.columns[col].lower():  # Highlight status column
-                    table_item.setForeground(Qt.green if value == "Online" else Qt.red)
-                self.table.setItem(row, col, table_item)
-
-            if self.actions:
-                actions_widget = QWidget()
-                actions_layout = QHBoxLayout(actions_widget)
-                actions_layout.setContentsMargins(0, 0, 0, 0)
-                for action_name, icon, callback in self.actions:
-                    button = QPushButton()
-                    button.setIcon(QIcon(icon))
-                    button.setStyleSheet(f"border-radius: 5px; padding: 2px; background-color: {self.get_action_color(action_name)};")
-                    button.clicked.connect(lambda checked, r=row, cb=callback: cb(r))
-                    actions_layout.addWidget(button)
-                self.table.setCellWidget(row, len(self.columns), actions_widget)
-
-        self.page_label.setText(f"Page {self.current_page} of {self.total_pages}")
-        self.prev_button.setEnabled(self.current_page > 1)
-        self.next_button.setEnabled(self.current_page < self.total_pages)
-
-    def get_action_color(self, action_name):
-        colors = {
-            "edit": "#4682b4",
-            "delete": "#ff4040",
-            "connect": "#32cd32",
-            "disconnect": "#ff8c00",
-            "restart": "#1e90ff"
-        }
-        return colors.get(action_name.lower(), "#4682b4")
-
-    def prev_page(self):
-        if self.current_page > 1:
-            self.current_page -= 1
-            self.update_table()
-
-    def next_page(self):
-        if self.current_page < self.total_pages:
-            self.current_page += 1
-            self.update_table()
-
-    def sort_by_column(self, index):
-        if index < len(self.columns):
-            self.data.sort(key=lambda x: x[index])
-            self.current_page = 1
-            self.update_table()
-
-    def set_data(self, data, total_pages=None):
-        self.data = data
-        if total_pages:
-            self.total_pages = total_pages
-        else:
-            self.total_pages = (len(self.data) + self.page_size - 1) // self.page_size
-        self.current_page = 1
-        self.update_table()
\ No newline at end of file
+        layout.addWidget(self.count_label)
+
+    def set_pager(self, pager):
+        """Show pager from its current block; rows above it load when scrolled to the top."""
+        self.model.set_pager(pager)
+        self.table.scrollToTop()
+        self.model.fetch_earlier()
+        self.update_count()
+
+    def refresh(self):
+        self.model.refresh()
+        self.update_count()
+
+    def show_sort(self, sort):
+        """Point the header's sort indicator at sort, a (key, descending) pair or None, without emitting sort_changed."""
+        self.sort = sort
+        header = self.table.horizontalHeader()
+        section = -1
+        if sort:
+            section = next(self.columns.index(column) for column, key in self.sort_keys.items() if key == sort[0])
+        header.blockSignals(True)
+        header.setSortIndicator(section, Qt.DescendingOrder if sort and sort[1] else Qt.AscendingOrder)
+        header.blockSignals(False)
+
+    def on_sort_indicator_changed(self, section, order):
+        key = self.sort_keys.get(self.columns[section]) if 0 <= section < len(self.columns) else None
+        if key is None:
+            self.show_sort(self.sort)  # Not sortable; put the indicator back
+            return
+        self.sort = (key, order == Qt.DescendingOrder)
+        self.sort_changed.emit()
+
+    def record(self, row):
+        return self.model.record(row)
+
+    def update_count(self):
+        total = self.model.pager.total_count if self.model.pager else 0
+        self.count_label.setText(f"{total:,} records")
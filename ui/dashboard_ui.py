@@ -1,15 +1,20 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
 from PySide6.QtGui import QIcon
 from db.database import Device, User, Attendance
-from utilities.device_manager import DeviceManager
+from utilities.device_sync import DeviceSyncEngine
+from utilities.cloud_sync import CloudSync
+from utilities.background_task import BackgroundTask
+from utilities.state_manager import state_manager
+from utilities.row_counts import row_counts
 from ui.processing_dialog import ProcessingDialog
 from ui.error_dialog import ErrorDialog
-import requests
 from utilities.logger import logger
 
 class DashboardScreen(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.cloud_sync = None
+        self.cloud_sync_options = None
         self.init_ui()
 
     def init_ui(self):
@@ -24,18 +29,18 @@ class DashboardScreen(QWidget):
 
         # Sync buttons
         sync_buttons_layout = QHBoxLayout()
-        post_cloud_button = QPushButton("Post Cloud")
-        post_cloud_button.setIcon(QIcon("icons/cloud-upload.png"))
-        post_cloud_button.setStyleSheet("border-radius: 5px; padding: 5px;")
-        post_cloud_button.clicked.connect(self.post_to_cloud)
-        pull_device_button = QPushButton("Pull Device")
-        pull_device_button.setIcon(QIcon("icons/download.png"))
-        pull_device_button.setStyleSheet("border-radius: 5px; padding: 5px;")
-        pull_device_button.clicked.connect(self.pull_from_device)
+        self.post_cloud_button = QPushButton("Post Cloud")
+        self.post_cloud_button.setIcon(QIcon("icons/cloud-upload.png"))
+        self.post_cloud_button.setStyleSheet("border-radius: 5px; padding: 5px;")
+        self.post_cloud_button.clicked.connect(self.post_to_cloud)
+        self.pull_device_button = QPushButton("Pull Device")
+        self.pull_device_button.setIcon(QIcon("icons/download.png"))
+        self.pull_device_button.setStyleSheet("border-radius: 5px; padding: 5px;")
+        self.pull_device_button.clicked.connect(self.pull_from_device)
 
         sync_buttons_layout.addStretch()
-        sync_buttons_layout.addWidget(post_cloud_button)
-        sync_buttons_layout.addWidget(pull_device_button)
+        sync_buttons_layout.addWidget(self.post_cloud_button)
+        sync_buttons_layout.addWidget(self.pull_device_button)
 
         header_layout.addWidget(title_label)
         header_layout.addWidget(subtitle_label)
@@ -44,9 +49,9 @@ class DashboardScreen(QWidget):
 
         # Stats
         stats_layout = QHBoxLayout()
-        devices_count = Device.select().count()
-        users_count = User.select().count()
-        attendance_count = Attendance.select().count()
+        devices_count = row_counts.total(Device)
+        users_count = row_counts.total(User)
+        attendance_count = row_counts.total(Attendance)
 
         devices_card = self.create_stat_card("Devices", str(devices_count), "icons/devices.png")
         users_card = self.create_stat_card("Users", str(users_count), "icons/users.png")
@@ -81,67 +86,86 @@ class DashboardScreen(QWidget):
         return card
 
     def post_to_cloud(self):
-        """Post all attendance data to the cloud server (abstract implementation)."""
+        """Post attendance records not yet delivered to the cloud on a background thread."""
         dialog = ProcessingDialog("Posting to Cloud...")
         dialog.show_with_message("Posting to Cloud...")
 
-        try:
-            # Abstract: Simulate posting attendance data to a cloud server
-            attendances = Attendance.select().dicts()
-            if not attendances:
-                dialog.close_after(1000)
-                return
-
-            # Simulate API call (replace with actual API endpoint)
-            cloud_url = "https://api.primesync.com/v1/attendance"
-            response = requests.post(cloud_url, json=list(attendances), timeout=5)
-            if response.status_code == 200:
-                logger.info(f"Successfully posted {len(attendances)} attendance records to cloud")
-                dialog.close_after(2000)  # Simulate processing time
-            else:
-                logger.error(f"Failed to post to cloud: {response.status_code}")
-                dialog.close_after(1000)
-                error_dialog = ErrorDialog(f"Failed to post to cloud: HTTP {response.status_code}")
-                error_dialog.exec()
-        except Exception as e:
-            logger.error(f"Error posting to cloud: {e}")
+        self.post_cloud_button.setEnabled(False)
+        settings = state_manager.settings
+        options = (settings["cloud_api_url"], settings["cloud_upload_concurrency"],
+                   settings["cloud_max_requests_per_second"])
+        if self.cloud_sync is None or self.cloud_sync_options != options:
+            # Kept between clicks so the pooled keep-alive connections are reused
+            if self.cloud_sync is not None:
+                self.cloud_sync.close()
+            self.cloud_sync = CloudSync(options[0], concurrency=options[1], max_rps=options[2])
+            self.cloud_sync_options = options
+        self.post_task = BackgroundTask(self.cloud_sync.push)
+        self.post_task.succeeded.connect(lambda result: self.on_post_finished(dialog, result))
+        self.post_task.failed.connect(lambda error: self.on_post_failed(dialog, error))
+        self.post_task.start()
+
+    def on_post_finished(self, dialog, result):
+        self.post_cloud_button.setEnabled(True)
+        success, message = result
+        if success:
+            logger.info(message)
+            dialog.close_after(2000)
+        else:
             dialog.close_after(1000)
-            error_dialog = ErrorDialog(f"Error posting to cloud: {str(e)}")
+            error_dialog = ErrorDialog(message)
             error_dialog.exec()
 
+    def on_post_failed(self, dialog, error):
+        self.post_cloud_button.setEnabled(True)
+        dialog.close_after(1000)
+        error_dialog = ErrorDialog(f"Error posting to cloud: {error}")
+        error_dialog.exec()
+
     def pull_from_device(self):
-        """Pull attendance data from all devices."""
+        """Pull attendance data from all devices concurrently on a background thread."""
         dialog = ProcessingDialog("Pulling from Devices...")
         dialog.show_with_message("Pulling from Devices...")
 
         try:
-            devices = Device.select()
+            devices = list(Device.select())
             if not devices:
                 logger.info("No devices found to pull attendance from")
                 dialog.close_after(1000)
                 return
 
-            total_records = 0
-            error_messages = []
-            for device in devices:
-                device_manager = DeviceManager(device)
-                success, message = device_manager.pull_attendance()
-                if success:
-                    if "Pulled" in message:
-                        records = int(message.split()[1])
-                        total_records += records
-                else:
-                    error_messages.append(f"Device {device.ip_address}: {message}")
-
-            if error_messages:
-                dialog.close_after(1000)
-                error_dialog = ErrorDialog("\n".join(error_messages))
-                error_dialog.exec()
-            else:
-                logger.info(f"Total attendance records pulled: {total_records}")
-                dialog.close_after(2000)  # Simulate processing time
+            self.pull_device_button.setEnabled(False)
+            self.pull_task = BackgroundTask(DeviceSyncEngine().pull_attendance, devices)
+            self.pull_task.succeeded.connect(lambda results: self.on_pull_finished(dialog, results))
+            self.pull_task.failed.connect(lambda error: self.on_pull_failed(dialog, error))
+            self.pull_task.start()
         except Exception as e:
             logger.error(f"Error pulling attendance from devices: {e}")
             dialog.close_after(1000)
             error_dialog = ErrorDialog(f"Error pulling attendance: {str(e)}")
-            error_dialog.exec()
\ No newline at end of file
+            error_dialog.exec()
+
+    def on_pull_finished(self, dialog, results):
+        self.pull_device_button.setEnabled(True)
+        total_records = 0
+        error_messages = []
+        for result in results:
+            logger.info(f"Device {result.device.ip_address}: {result.records} records in {result.duration:.2f}s")
+            if result.success:
+                total_records += result.records
+            else:
+                error_messages.append(f"Device {result.device.ip_address}: {result.error}")
+
+        if error_messages:
+            dialog.close_after(1000)
+            error_dialog = ErrorDialog("\n".join(error_messages))
+            error_dialog.exec()
+        else:
+            logger.info(f"Total attendance records pulled: {total_records}")
+            dialog.close_after(2000)  # Simulate processing time
+
+    def on_pull_failed(self, dialog, error):
+        self.pull_device_button.setEnabled(True)
+        dialog.close_after(1000)
+        error_dialog = ErrorDialog(f"Error pulling attendance: {error}")
+        error_dialog.exec()
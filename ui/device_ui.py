@@ -1,15 +1,37 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QInputDialog, QMessageBox
+from PySide6.QtCore import QTimer
 from PySide6.QtGui import QIcon
 from logic.device_logic import DeviceLogic
-from ui.components.table_widget import PaginatedTableWidget
+from ui.components.table_widget import LazyTableWidget
 from ui.components.form_dialog import FormDialog
+from ui.components.search_controller import SearchController
+from ui.processing_dialog import ProcessingDialog
+from ui.error_dialog import ErrorDialog
+from utilities.background_task import BackgroundTask
+from utilities.constants import HEALTH_CHECK_INTERVAL
+from utilities.device_discovery import DeviceDiscovery, local_subnet
+from utilities.device_sync import DeviceSyncEngine
 
 class DeviceScreen(QWidget):
     def __init__(self):
         super().__init__()
-        self.logic = DeviceLogic(page_size=10)  # Smaller page size for testing
+        self.logic = DeviceLogic()
+        self.search = SearchController(self.logic.search, parent=self)
+        self.search.results_ready.connect(self.on_search_finished)
+        self.search.failed.connect(self.on_search_failed)
         self.init_ui()
 
+        # Pick up the status the health monitor writes in the background
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_devices)
+        self.refresh_timer.start(HEALTH_CHECK_INTERVAL * 1000)
+
+    @staticmethod
+    def device_row(d):
+        last_seen = d.last_seen_at.strftime("%Y-%m-%d %H:%M:%S") if d.last_seen_at else "Never"
+        latency = f"{d.latency_ms} ms" if d.latency_ms is not None else "-"
+        return [d.device_model, d.ip_address, d.port, d.password, d.status, last_seen, latency]
+
     def init_ui(self):
         layout = QVBoxLayout(self)
 
@@ -21,17 +43,22 @@ class DeviceScreen(QWidget):
         subtitle_label.setStyleSheet("font-size: 14px; color: gray;")
 
         header_buttons_layout = QHBoxLayout()
-        quick_scan_button = QPushButton("Quick Scan")
-        quick_scan_button.setIcon(QIcon("icons/radar.png"))
-        quick_scan_button.setStyleSheet("border-radius: 5px; padding: 5px; background-color: green; color: white;")
-        quick_scan_button.clicked.connect(lambda: print("Quick Scan clicked"))
+        self.quick_scan_button = QPushButton("Quick Scan")
+        self.quick_scan_button.setIcon(QIcon("icons/radar.png"))
+        self.quick_scan_button.setStyleSheet("border-radius: 5px; padding: 5px; background-color: green; color: white;")
+        self.quick_scan_button.clicked.connect(self.quick_scan)
+        self.repull_button = QPushButton("Re-pull Attendance")
+        self.repull_button.setIcon(QIcon("icons/reload.png"))
+        self.repull_button.setStyleSheet("border-radius: 5px; padding: 5px;")
+        self.repull_button.clicked.connect(self.repull_attendance)
         add_device_button = QPushButton("Add Device")
         add_device_button.setIcon(QIcon("icons/plus.png"))
         add_device_button.setStyleSheet("background-color: #4682b4; color: white; border-radius: 5px; padding: 5px;")
         add_device_button.clicked.connect(self.add_device)
 
         header_buttons_layout.addStretch()
-        header_buttons_layout.addWidget(quick_scan_button)
+        header_buttons_layout.addWidget(self.quick_scan_button)
+        header_buttons_layout.addWidget(self.repull_button)
         header_buttons_layout.addWidget(add_device_button)
 
         header_layout.addWidget(title_label)
@@ -47,41 +74,38 @@ class DeviceScreen(QWidget):
         layout.addWidget(self.search_bar)
 
         # Table
-        devices, _, total_pages = self.logic.get_page()
-        self.table_data = [[d.device_model, d.ip_address, d.port, d.password, d.status, d.id] for d in devices]
         actions = [
             ("edit", "icons/pencil.png", self.edit_device),
             ("delete", "icons/bin.png", self.delete_device),
-            ("connect", "icons/plug-connect.png", lambda row: print(f"Connect device {self.table_data[row][0]}")),
-            ("disconnect", "icons/plug-disconnect.png", lambda row: print(f"Disconnect device {self.table_data[row][0]}")),
-            ("restart", "icons/restart.png", lambda row: print(f"Restart device {self.table_data[row][0]}"))
+            ("connect", "icons/plug-connect.png", lambda row: print(f"Connect device {self.table.record(row).device_model}")),
+            ("disconnect", "icons/plug-disconnect.png", lambda row: print(f"Disconnect device {self.table.record(row).device_model}")),
+            ("restart", "icons/restart.png", lambda row: print(f"Restart device {self.table.record(row).device_model}"))
         ]
-        self.table = PaginatedTableWidget(["Name", "IP Address", "Port", "Password", "Status"], self.table_data, page_size=10, actions=actions)
-        self.table.prev_button.clicked.disconnect()
-        self.table.next_button.clicked.disconnect()
-        self.table.prev_button.clicked.connect(self.prev_page)
-        self.table.next_button.clicked.connect(self.next_page)
+        self.table = LazyTableWidget(["Name", "IP Address", "Port", "Password", "Status", "Last Seen", "Latency"], self.device_row, actions=actions,
+                                     sort_keys={"Name": "device_model", "IP Address": "ip_address", "Port": "port", "Status": "status"})
+        self.table.show_sort(self.logic.sort)
+        self.table.sort_changed.connect(self.sort_devices)
+        self.table.set_pager(self.logic.pager)
         layout.addWidget(self.table)
 
-    def prev_page(self):
-        if self.logic.current_page > 1:
-            self.logic.load_page(self.logic.current_page - 1)
-            self.filter_devices()
+    def filter_devices(self):
+        self.search.request(self.search_bar.text(), self.table.sort)
 
-    def next_page(self):
-        devices, _, total_pages = self.logic.get_page()
-        if self.logic.current_page < total_pages:
-            self.logic.load_page(self.logic.current_page + 1)
-            self.filter_devices()
+    def sort_devices(self):
+        # Keep the filter in effect and reorder right away, without the typing delay
+        self.search.request(self.logic.search_text, self.table.sort)
+        self.search.run()
 
-    def filter_devices(self):
-        search_text = self.search_bar.text()
-        if search_text:
-            filtered_devices, _, total_pages = self.logic.filter_devices(search_text)
-        else:
-            filtered_devices, _, total_pages = self.logic.get_page()
-        self.table_data = [[d.device_model, d.ip_address, d.port, d.password, d.status, d.id] for d in filtered_devices]
-        self.table.set_data(self.table_data, total_pages)
+    def on_search_finished(self, result):
+        self.logic.apply_search(result)
+        self.table.set_pager(self.logic.pager)
+
+    def on_search_failed(self, error):
+        error_dialog = ErrorDialog(f"Error searching devices: {error}")
+        error_dialog.exec()
+
+    def refresh_devices(self):
+        self.table.refresh()
 
     def add_device(self):
         dialog = FormDialog([
@@ -93,11 +117,89 @@ class DeviceScreen(QWidget):
         ], title="Add Device")
         if dialog.exec():
             self.logic.add_device(dialog.get_data())
-            self.filter_devices()
+            self.table.refresh()
+
+    def quick_scan(self):
+        """Sweep a subnet for ZK devices on a background thread."""
+        cidr, ok = QInputDialog.getText(self, "Quick Scan", "Network range to scan (CIDR):", text=local_subnet())
+        if not ok or not cidr.strip():
+            return
+
+        dialog = ProcessingDialog("Scanning Network...")
+        dialog.show_with_message(f"Scanning {cidr.strip()}...")
+        self.quick_scan_button.setEnabled(False)
+        self.scan_task = BackgroundTask(DeviceDiscovery().scan, cidr, self.logic.registered_addresses())
+        self.scan_task.succeeded.connect(lambda found: self.on_scan_finished(dialog, found))
+        self.scan_task.failed.connect(lambda error: self.on_scan_failed(dialog, error))
+        self.scan_task.start()
+
+    def on_scan_finished(self, dialog, found):
+        self.quick_scan_button.setEnabled(True)
+        dialog.accept()
+        if not found:
+            QMessageBox.information(self, "Quick Scan", "No new devices were found.", QMessageBox.Ok)
+            return
+
+        lines = [f"{device.ip_address}:{device.port}" + (" (comm key required)" if device.requires_password else "")
+                 for device in found]
+        answer = QMessageBox.question(
+            self, "Quick Scan",
+            f"Found {len(found)} new devices:\n\n" + "\n".join(lines) + "\n\nAdd them to the device list?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if answer == QMessageBox.Yes:
+            self.logic.add_discovered_devices(found)
+            self.table.refresh()
+            if any(device.requires_password for device in found):
+                QMessageBox.information(self, "Quick Scan",
+                                        "Edit the devices that require a comm key and enter their password.",
+                                        QMessageBox.Ok)
+
+    def on_scan_failed(self, dialog, error):
+        self.quick_scan_button.setEnabled(True)
+        dialog.accept()
+        error_dialog = ErrorDialog(f"Error scanning network: {error}")
+        error_dialog.exec()
+
+    def repull_attendance(self):
+        """Re-read the whole attendance log of the selected devices (all devices if none are selected)."""
+        rows = sorted({index.row() for index in self.table.table.selectionModel().selectedRows()})
+        devices = self.logic.load_devices(self.table.record(row).id for row in rows) if rows else None
+        target = f"the {len(devices)} selected devices" if devices else "all devices"
+        answer = QMessageBox.question(
+            self, "Re-pull Attendance",
+            f"Download and re-process the full attendance log of {target}?\n\n"
+            "Records that are already stored are skipped.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if answer != QMessageBox.Yes:
+            return
+
+        dialog = ProcessingDialog("Pulling from Devices...")
+        dialog.show_with_message("Re-pulling attendance...")
+        self.repull_button.setEnabled(False)
+        self.repull_task = BackgroundTask(DeviceSyncEngine().pull_attendance, devices, full=True)
+        self.repull_task.succeeded.connect(lambda results: self.on_repull_finished(dialog, results))
+        self.repull_task.failed.connect(lambda error: self.on_repull_failed(dialog, error))
+        self.repull_task.start()
+
+    def on_repull_finished(self, dialog, results):
+        self.repull_button.setEnabled(True)
+        dialog.close_after(1000)
+        error_messages = [f"Device {result.device.ip_address}: {result.error}" for result in results if not result.success]
+        if error_messages:
+            error_dialog = ErrorDialog("\n".join(error_messages))
+            error_dialog.exec()
+
+    def on_repull_failed(self, dialog, error):
+        self.repull_button.setEnabled(True)
+        dialog.close_after(1000)
+        error_dialog = ErrorDialog(f"Error pulling attendance: {error}")
+        error_dialog.exec()
 
     def edit_device(self, row):
-        device_id = self.table_data[row][-1]
-        device = next(d for d in self.logic.devices if d.id == device_id)
+        device = self.table.record(row)
+        device_id = device.id
         dialog = FormDialog([
             ("Device Model", "text", []),
             ("IP Address", "text", []),
@@ -113,9 +215,8 @@ class DeviceScreen(QWidget):
         })
         if dialog.exec():
             self.logic.edit_device(device_id, dialog.get_data())
-            self.filter_devices()
+            self.table.refresh()
 
     def delete_device(self, row):
-        device_id = self.table_data[row][-1]
-        self.logic.delete_device(device_id)
-        self.filter_devices()
\ No newline at end of file
+        self.logic.delete_device(self.table.record(row).id)
+        self.table.refresh()
\ No newline at end of file
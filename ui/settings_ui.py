@@ -62,6 +62,23 @@ class SettingsScreen(QWidget):
         self.enable_periodic_sync.setChecked(state_manager.settings["enable_periodic_sync"])
         form_layout.addRow(self.enable_periodic_sync)
 
+        self.enable_live_capture = QCheckBox("Enable Live Capture (stream punches as they happen)")
+        self.enable_live_capture.setChecked(state_manager.settings["enable_live_capture"])
+        form_layout.addRow(self.enable_live_capture)
+
+        self.cloud_upload_concurrency = QSpinBox()
+        self.cloud_upload_concurrency.setRange(1, 16)
+        self.cloud_upload_concurrency.setValue(state_manager.settings["cloud_upload_concurrency"])
+        self.cloud_upload_concurrency.setStyleSheet("border-radius: 5px; padding: 5px;")
+        form_layout.addRow("Parallel Cloud Uploads", self.cloud_upload_concurrency)
+
+        self.cloud_max_requests_per_second = QSpinBox()
+        self.cloud_max_requests_per_second.setRange(0, 100)
+        self.cloud_max_requests_per_second.setSpecialValueText("Unlimited")
+        self.cloud_max_requests_per_second.setValue(state_manager.settings["cloud_max_requests_per_second"])
+        self.cloud_max_requests_per_second.setStyleSheet("border-radius: 5px; padding: 5px;")
+        form_layout.addRow("Cloud Requests per Second", self.cloud_max_requests_per_second)
+
         layout.addLayout(form_layout)
 
         # Buttons
@@ -92,6 +109,9 @@ class SettingsScreen(QWidget):
         time = QTime.fromString(settings["periodic_sync_time"], "h:mm AP")
         self.periodic_sync_time.setTime(time)
         self.enable_periodic_sync.setChecked(settings["enable_periodic_sync"])
+        self.enable_live_capture.setChecked(settings["enable_live_capture"])
+        self.cloud_upload_concurrency.setValue(settings["cloud_upload_concurrency"])
+        self.cloud_max_requests_per_second.setValue(settings["cloud_max_requests_per_second"])
 
     def test_connection(self):
         if self.logic.test_connection():
@@ -105,7 +125,10 @@ class SettingsScreen(QWidget):
             "auto_check_interval": self.auto_check_interval.value(),
             "enable_auto_sync": self.enable_auto_sync.isChecked(),
             "periodic_sync_time": self.periodic_sync_time.time().toString("h:mm AP"),
-            "enable_periodic_sync": self.enable_periodic_sync.isChecked()
+            "enable_periodic_sync": self.enable_periodic_sync.isChecked(),
+            "enable_live_capture": self.enable_live_capture.isChecked(),
+            "cloud_upload_concurrency": self.cloud_upload_concurrency.value(),
+            "cloud_max_requests_per_second": self.cloud_max_requests_per_second.value()
         }
         self.logic.save_settings(settings)
         QMessageBox.information(self, "Settings Saved", "Settings saved successfully!", QMessageBox.Ok)
\ No newline at end of file
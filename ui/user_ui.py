@@ -1,17 +1,32 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QComboBox
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QComboBox, QToolButton,
+                               QMenu)
+from PySide6.QtCore import Qt
 from PySide6.QtGui import QIcon
 from logic.user_logic import UserLogic
-from ui.components.table_widget import PaginatedTableWidget
+from ui.components.table_widget import LazyTableWidget
 from ui.components.form_dialog import FormDialog
-from utilities.device_manager import DeviceManager
+from ui.components.search_controller import SearchController
+from utilities.device_sync import DeviceSyncEngine
+from utilities.user_sync_queue import UserSyncQueue
+from utilities.cloud_user_sync import CloudUserReconciler
+from utilities.background_task import BackgroundTask
+from utilities.state_manager import state_manager
 from ui.processing_dialog import ProcessingDialog
 from ui.error_dialog import ErrorDialog
-from db.database import Device
 
 class UserScreen(QWidget):
     def __init__(self):
         super().__init__()
-        self.logic = UserLogic(page_size=10)
+        self.logic = UserLogic()
+        self.search = SearchController(self.logic.search, parent=self)
+        self.search.results_ready.connect(self.on_search_finished)
+        self.search.failed.connect(self.on_search_failed)
+        self.sync_queue = UserSyncQueue(parent=self)
+        self.sync_change_count = 0
+        self.sync_queue.sync_started.connect(self.on_sync_started)
+        self.sync_queue.sync_finished.connect(self.on_sync_finished)
+        self.sync_queue.sync_failed.connect(self.on_sync_failed)
+        self.sync_queue.resume()
         self.init_ui()
 
     def init_ui(self):
@@ -25,15 +40,26 @@ class UserScreen(QWidget):
         subtitle_label.setStyleSheet("font-size: 14px; color: gray;")
 
         header_buttons_layout = QHBoxLayout()
-        pull_users_button = QPushButton("Pull Users")
-        pull_users_button.setIcon(QIcon("icons/download.png"))
-        pull_users_button.setStyleSheet("border-radius: 5px; padding: 5px;")
-        pull_users_button.clicked.connect(self.pull_users)
-
-        push_users_button = QPushButton("Push Users")
-        push_users_button.setIcon(QIcon("icons/upload.png"))
-        push_users_button.setStyleSheet("border-radius: 5px; padding: 5px;")
-        push_users_button.clicked.connect(self.push_users)
+        self.pull_users_button = QPushButton("Pull Users")
+        self.pull_users_button.setIcon(QIcon("icons/download.png"))
+        self.pull_users_button.setStyleSheet("border-radius: 5px; padding: 5px;")
+        self.pull_users_button.clicked.connect(self.pull_users)
+
+        self.push_users_button = QPushButton("Push Users")
+        self.push_users_button.setIcon(QIcon("icons/upload.png"))
+        self.push_users_button.setStyleSheet("border-radius: 5px; padding: 5px;")
+        self.push_users_button.clicked.connect(self.push_users)
+
+        self.link_cloud_button = QToolButton()
+        self.link_cloud_button.setText("Link Cloud IDs")
+        self.link_cloud_button.setIcon(QIcon("icons/cloud-upload.png"))
+        self.link_cloud_button.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.link_cloud_button.setPopupMode(QToolButton.MenuButtonPopup)
+        self.link_cloud_button.setStyleSheet("border-radius: 5px; padding: 5px;")
+        self.link_cloud_button.clicked.connect(lambda: self.link_cloud_ids())
+        link_menu = QMenu(self.link_cloud_button)
+        link_menu.addAction("Re-link All Users", lambda: self.link_cloud_ids(full=True))
+        self.link_cloud_button.setMenu(link_menu)
 
         add_user_button = QPushButton("Add User")
         add_user_button.setIcon(QIcon("icons/user--plus.png"))
@@ -41,12 +67,17 @@ class UserScreen(QWidget):
         add_user_button.clicked.connect(self.add_user)
 
         header_buttons_layout.addStretch()
-        header_buttons_layout.addWidget(pull_users_button)
-        header_buttons_layout.addWidget(push_users_button)
+        header_buttons_layout.addWidget(self.pull_users_button)
+        header_buttons_layout.addWidget(self.push_users_button)
+        header_buttons_layout.addWidget(self.link_cloud_button)
         header_buttons_layout.addWidget(add_user_button)
 
+        self.sync_status_label = QLabel()
+        self.sync_status_label.setStyleSheet("font-size: 12px; color: gray;")
+
         header_layout.addWidget(title_label)
         header_layout.addWidget(subtitle_label)
+        header_layout.addWidget(self.sync_status_label)
         header_layout.addLayout(header_buttons_layout)
         layout.addLayout(header_layout)
 
@@ -78,46 +109,37 @@ class UserScreen(QWidget):
         layout.addLayout(search_filter_layout)
 
         # Table
-        users, _, total_pages = self.logic.get_page()
-        self.table_data = [[u.uid, u.name, {1: "Admin", 2: "Manager", 3: "User"}.get(u.role, "Unknown"), str(u.password),
-                           str(u.group_id), str(u.user_id), str(u.card), str(u.user_cloud_id), u.uid] for u in users]
         actions = [
             ("edit", "icons/pencil.png", self.edit_user),
             ("delete", "icons/bin--minus.png", self.delete_user)
         ]
-        self.table = PaginatedTableWidget(
+        self.table = LazyTableWidget(
             ["UID", "Name", "Role", "Password", "Group ID", "User ID", "Card", "Cloud ID"],
-            self.table_data,
-            page_size=10,
-            actions=actions
+            lambda u: [u.uid, u.name, {1: "Admin", 2: "Manager", 3: "User"}.get(u.role, "Unknown"), u.password,
+                       u.group_id, u.user_id, u.card, u.user_cloud_id],
+            actions=actions,
+            sort_keys={"UID": "uid", "Name": "name", "User ID": "user_id"}
         )
-        self.table.prev_button.clicked.disconnect()
-        self.table.next_button.clicked.disconnect()
-        self.table.prev_button.clicked.connect(self.prev_page)
-        self.table.next_button.clicked.connect(self.next_page)
+        self.table.show_sort(self.logic.sort)
+        self.table.sort_changed.connect(self.sort_users)
+        self.table.set_pager(self.logic.pager)
         layout.addWidget(self.table)
 
-    def prev_page(self):
-        if self.logic.current_page > 1:
-            self.logic.load_page(self.logic.current_page - 1)
-            self.filter_users()
+    def filter_users(self):
+        self.search.request(self.search_bar.text(), self.role_filter.currentText(), self.table.sort)
+
+    def sort_users(self):
+        # Keep the filters in effect and reorder right away, without the typing delay
+        self.search.request(self.logic.search_text, self.logic.role_filter, self.table.sort)
+        self.search.run()
 
-    def next_page(self):
-        users, _, total_pages = self.logic.get_page()
-        if self.logic.current_page < total_pages:
-            self.logic.load_page(self.logic.current_page + 1)
-            self.filter_users()
+    def on_search_finished(self, result):
+        self.logic.apply_search(result)
+        self.table.set_pager(self.logic.pager)
 
-    def filter_users(self):
-        search_text = self.search_bar.text()
-        role_filter = self.role_filter.currentText()
-        if search_text or role_filter != "All Roles":
-            filtered_users, _, total_pages = self.logic.filter_users(search_text, role_filter)
-        else:
-            filtered_users, _, total_pages = self.logic.get_page()
-        self.table_data = [[u.uid, u.name, {1: "Admin", 2: "Manager", 3: "User"}.get(u.role, "Unknown"), str(u.password),
-                           str(u.group_id), str(u.user_id), str(u.card), str(u.user_cloud_id), u.uid] for u in filtered_users]
-        self.table.set_data(self.table_data, total_pages)
+    def on_search_failed(self, error):
+        error_dialog = ErrorDialog(f"Error searching users: {error}")
+        error_dialog.exec()
 
     def add_user(self):
         dialog = FormDialog([
@@ -129,13 +151,13 @@ class UserScreen(QWidget):
             ("Card Number", "text", [])
         ], title="Add User")
         if dialog.exec():
-            self.logic.add_user(dialog.get_data())
-            self.filter_users()
-            self.sync_users_to_devices("Adding user to devices...")
+            uid = self.logic.add_user(dialog.get_data())
+            self.table.refresh()
+            self.sync_queue.upsert(uid)
 
     def edit_user(self, row):
-        uid = self.table_data[row][-1]
-        user = next(u for u in self.logic.users if u.uid == uid)
+        user = self.table.record(row)
+        uid = user.uid
         dialog = FormDialog([
             ("Full Name", "text", []),
             ("Role", "combo", ["Admin", "Manager", "User"]),
@@ -153,129 +175,132 @@ class UserScreen(QWidget):
         })
         if dialog.exec():
             self.logic.edit_user(uid, dialog.get_data())
-            self.filter_users()
-            self.sync_users_to_devices("Updating user on devices...")
+            self.table.refresh()
+            self.sync_queue.upsert(uid)
 
     def delete_user(self, row):
-        uid = self.table_data[row][-1]
+        uid = self.table.record(row).uid
         self.logic.delete_user(uid)
-        self.filter_users()
-        self.sync_users_to_devices("Removing user from devices...")
+        self.table.refresh()
+        self.sync_queue.delete(uid)
 
     def import_users(self):
-        self.logic.import_users(self)
-        self.filter_users()
-        self.sync_users_to_devices("Syncing imported users to devices...")
+        uids = self.logic.import_users(self)
+        self.table.refresh()
+        if uids:
+            self.sync_queue.upsert(*uids)
 
     def export_users(self):
         self.logic.export_users(self)
 
     def pull_users(self):
-        """Pull users from all devices."""
+        """Pull users from all devices concurrently on a background thread."""
         dialog = ProcessingDialog("Pulling Users from Devices...")
         dialog.show_with_message("Pulling Users from Devices...")
-
-        try:
-            devices = Device.select()
-            if not devices:
-                dialog.close_after(1000)
-                error_dialog = ErrorDialog("No devices found to pull users from.")
-                error_dialog.exec()
-                return
-
-            total_users = 0
-            error_messages = []
-            for device in devices:
-                device_manager = DeviceManager(device)
-                success, message = device_manager.pull_users()
-                if success:
-                    if "Pulled" in message:
-                        users = int(message.split()[1])
-                        total_users += users
-                else:
-                    error_messages.append(f"Device {device.ip_address}: {message}")
-
-            if error_messages:
-                dialog.close_after(1000)
-                error_dialog = ErrorDialog("\n".join(error_messages))
-                error_dialog.exec()
-            else:
-                self.logic.load_page(self.logic.current_page)  # Refresh the user list
-                self.filter_users()
-                dialog.close_after(2000)
-        except Exception as e:
-            dialog.close_after(1000)
-            error_dialog = ErrorDialog(f"Error pulling users: {str(e)}")
+        self.pull_users_button.setEnabled(False)
+        self.pull_task = BackgroundTask(DeviceSyncEngine().pull_users)
+        self.pull_task.succeeded.connect(lambda results: self.on_pull_finished(dialog, results))
+        self.pull_task.failed.connect(lambda error: self.on_pull_failed(dialog, error))
+        self.pull_task.start()
+
+    def on_pull_finished(self, dialog, results):
+        self.pull_users_button.setEnabled(True)
+        dialog.close_after(1000)
+        if not results:
+            error_dialog = ErrorDialog("No devices found to pull users from.")
+            error_dialog.exec()
+            return
+        self.table.refresh()
+        succeeded = [result for result in results if result.success]
+        total_users = sum(result.records for result in succeeded)
+        self.sync_status_label.setText(f"Pulled {total_users} users from {len(succeeded)} of {len(results)} devices.")
+        error_messages = [f"Device {result.device.ip_address}: {result.error}" for result in results if not result.success]
+        if error_messages:
+            error_dialog = ErrorDialog("\n".join(error_messages))
             error_dialog.exec()
 
+    def on_pull_failed(self, dialog, error):
+        self.pull_users_button.setEnabled(True)
+        dialog.close_after(1000)
+        error_dialog = ErrorDialog(f"Error pulling users: {error}")
+        error_dialog.exec()
+
     def push_users(self):
-        """Push users to all devices."""
+        """Push users to all devices concurrently on a background thread."""
         dialog = ProcessingDialog("Pushing Users to Devices...")
         dialog.show_with_message("Pushing Users to Devices...")
-
-        try:
-            devices = Device.select()
-            if not devices:
-                dialog.close_after(1000)
-                error_dialog = ErrorDialog("No devices found to push users to.")
-                error_dialog.exec()
-                return
-
-            total_users = 0
-            error_messages = []
-            for device in devices:
-                device_manager = DeviceManager(device)
-                success, message = device_manager.push_users()
-                if success:
-                    if "Pushed" in message:
-                        users = int(message.split()[1])
-                        total_users += users
-                else:
-                    error_messages.append(f"Device {device.ip_address}: {message}")
-
-            if error_messages:
-                dialog.close_after(1000)
-                error_dialog = ErrorDialog("\n".join(error_messages))
-                error_dialog.exec()
-            else:
-                dialog.close_after(2000)
-        except Exception as e:
-            dialog.close_after(1000)
-            error_dialog = ErrorDialog(f"Error pushing users: {str(e)}")
+        self.push_users_button.setEnabled(False)
+        # Also removes users deleted here whose targeted delete never reached a device
+        self.push_task = BackgroundTask(DeviceSyncEngine().push_users, prune=True)
+        self.push_task.succeeded.connect(lambda results: self.on_push_finished(dialog, results))
+        self.push_task.failed.connect(lambda error: self.on_push_failed(dialog, error))
+        self.push_task.start()
+
+    def on_push_finished(self, dialog, results):
+        self.push_users_button.setEnabled(True)
+        dialog.close_after(1000)
+        if not results:
+            error_dialog = ErrorDialog("No devices found to push users to.")
+            error_dialog.exec()
+            return
+        added = sum(result.summary.get("added", 0) for result in results)
+        updated = sum(result.summary.get("updated", 0) for result in results)
+        removed = sum(result.summary.get("removed", 0) for result in results)
+        self.sync_status_label.setText(f"Pushed users to devices ({added} added, {updated} updated, {removed} removed).")
+        error_messages = [f"Device {result.device.ip_address}: {result.error}" for result in results if not result.success]
+        if error_messages:
+            error_dialog = ErrorDialog("\n".join(error_messages))
             error_dialog.exec()
 
-    def sync_users_to_devices(self, message):
-        """Sync users to all devices after create/update/delete/import."""
-        dialog = ProcessingDialog(message)
-        dialog.show_with_message(message)
+    def on_push_failed(self, dialog, error):
+        self.push_users_button.setEnabled(True)
+        dialog.close_after(1000)
+        error_dialog = ErrorDialog(f"Error pushing users: {error}")
+        error_dialog.exec()
+
+    def link_cloud_ids(self, full=False):
+        """Match local users to the cloud user directory on a background thread; full=True re-reads the whole directory."""
+        self.link_cloud_button.setEnabled(False)
+        self.sync_status_label.setText("Linking users to cloud IDs...")
+        reconciler = CloudUserReconciler(state_manager.settings["cloud_api_url"])
+        self.link_task = BackgroundTask(reconciler.reconcile, full=full)
+        self.link_task.succeeded.connect(self.on_link_finished)
+        self.link_task.failed.connect(self.on_link_failed)
+        self.link_task.start()
+
+    def on_link_finished(self, result):
+        self.link_cloud_button.setEnabled(True)
+        success, message = result
+        self.sync_status_label.setText(message)
+        if success:
+            self.table.refresh()
+        else:
+            error_dialog = ErrorDialog(message)
+            error_dialog.exec()
 
-        try:
-            devices = Device.select()
-            if not devices:
-                dialog.close_after(1000)
-                error_dialog = ErrorDialog("No devices found to sync users to.")
-                error_dialog.exec()
-                return
-
-            total_users = 0
-            error_messages = []
-            for device in devices:
-                device_manager = DeviceManager(device)
-                success, message = device_manager.push_users()
-                if success:
-                    if "Pushed" in message:
-                        users = int(message.split()[1])
-                        total_users += users
-                else:
-                    error_messages.append(f"Device {device.ip_address}: {message}")
-
-            if error_messages:
-                dialog.close_after(1000)
+    def on_link_failed(self, error):
+        self.link_cloud_button.setEnabled(True)
+        self.sync_status_label.setText("Linking cloud IDs failed.")
+        error_dialog = ErrorDialog(f"Error linking cloud IDs: {error}")
+        error_dialog.exec()
+
+    def on_sync_started(self, change_count):
+        self.sync_change_count = change_count
+        if change_count:
+            self.sync_status_label.setText(f"Syncing {change_count} user change(s) to devices...")
+
+    def on_sync_finished(self, results):
+        error_messages = [f"Device {r.device.ip_address}: {r.error}" for r in results if not r.success]
+        if error_messages:
+            self.sync_status_label.setText(f"User sync failed on {len(error_messages)} device(s); will retry.")
+            if self.sync_change_count:  # Background retries of missed changes don't interrupt the user
                 error_dialog = ErrorDialog("\n".join(error_messages))
                 error_dialog.exec()
-            else:
-                dialog.close_after(2000)
-        except Exception as e:
-            dialog.close_after(1000)
-            error_dialog = ErrorDialog(f"Error syncing users: {str(e)}")
-            error_dialog.exec()
\ No newline at end of file
+        else:
+            changes = sum(r.records for r in results)
+            self.sync_status_label.setText(f"Devices up to date ({changes} change(s) applied).")
+
+    def on_sync_failed(self, error):
+        self.sync_status_label.setText("User sync failed.")
+        error_dialog = ErrorDialog(f"Error syncing users: {error}")
+        error_dialog.exec()
@@ -0,0 +1,99 @@
+from peewee import Value, chunked
+import datetime
+from db.database import db, User, Attendance, UnmatchedAttendance
+from utilities.constants import PUNCH_CHECK_IN, INGEST_BATCH_SIZE
+from utilities.logger import logger
+
+
+def punch_labels(punch):
+    """Map a pyzk punch code to the (status, punch) labels stored in Attendance."""
+    if punch == PUNCH_CHECK_IN:
+        return "Check-In", "IN"
+    return "Check-Out", "OUT"
+
+
+def ingest_attendance(records, batch_size=INGEST_BATCH_SIZE):
+    """Store pyzk attendance records in bulk and return counts of what happened to them.
+
+    Users are resolved from a uid set loaded once and rows are written with chunked
+    insert_many inside a single transaction. Duplicates are left to the unique
+    (uid, timestamp, status) index: conflicting rows are skipped by ON CONFLICT DO
+    NOTHING, so nothing has to be read back first. Records for a numeric user ID with
+    no local user yet are kept in unmatched_attendance until ingest_unmatched_attendance()
+    finds their user, so the caller can move its watermark past them.
+    """
+    summary = {"inserted": 0, "duplicates": 0, "unknown_users": 0}
+    if not records:
+        return summary
+
+    known_uids = {uid for (uid,) in User.select(User.uid).tuples()}
+    rows = []
+    held = []
+    unknown = set()
+    now = datetime.datetime.now()
+    for att in records:
+        try:
+            uid = int(att.user_id)
+        except (TypeError, ValueError):
+            uid = None
+        status, punch = punch_labels(att.punch)
+        if uid not in known_uids:
+            summary["unknown_users"] += 1
+            unknown.add(att.user_id)
+            if uid is not None:
+                held.append({"uid": uid, "timestamp": att.timestamp, "status": status, "punch": punch,
+                             "created_at": now})
+            continue
+
+        rows.append({
+            "user": uid,
+            "timestamp": att.timestamp,
+            "status": status,
+            "punch": punch,
+            "uid": uid,
+            "created_at": now
+        })
+
+    if unknown:
+        logger.warning(f"Held {len(held)} of {summary['unknown_users']} attendance records for unknown user IDs "
+                       f"until the users exist: {', '.join(sorted(str(user_id) for user_id in unknown))}")
+    if not rows and not held:
+        return summary
+
+    with db.atomic():
+        for batch in chunked(rows, batch_size):
+            summary["inserted"] += (Attendance.insert_many(batch)
+                                    .on_conflict(conflict_target=[Attendance.uid, Attendance.timestamp,
+                                                                  Attendance.status], action="nothing")
+                                    .as_rowcount()
+                                    .execute())
+        for batch in chunked(held, batch_size):
+            (UnmatchedAttendance.insert_many(batch)
+             .on_conflict(conflict_target=[UnmatchedAttendance.uid, UnmatchedAttendance.timestamp,
+                                           UnmatchedAttendance.status], action="nothing")
+             .execute())
+    summary["duplicates"] = len(rows) - summary["inserted"]
+    return summary
+
+
+def ingest_unmatched_attendance():
+    """Move held punches whose user now exists into attendance; returns how many were stored.
+
+    Call after users are created. Runs as one INSERT ... SELECT, so held punches are
+    never loaded into Python.
+    """
+    known = UnmatchedAttendance.uid.in_(User.select(User.uid))
+    with db.atomic():
+        held = UnmatchedAttendance.select(
+            UnmatchedAttendance.uid, UnmatchedAttendance.timestamp, UnmatchedAttendance.status,
+            UnmatchedAttendance.punch, UnmatchedAttendance.uid, Value(datetime.datetime.now())
+        ).where(known)
+        inserted = (Attendance.insert_from(held, [Attendance.user, Attendance.timestamp, Attendance.status,
+                                                  Attendance.punch, Attendance.uid, Attendance.created_at])
+                    .on_conflict_ignore()
+                    .as_rowcount()
+                    .execute())
+        UnmatchedAttendance.delete().where(known).execute()
+    if inserted:
+        logger.info(f"Stored {inserted} held attendance records for newly added users")
+    return inserted
@@ -0,0 +1,30 @@
+from PySide6.QtCore import QThread, Signal
+from db.database import db
+from utilities.logger import logger
+
+
+class BackgroundTask(QThread):
+    """Run a blocking callable off the Qt main thread and report its result via signals.
+
+    The thread's pooled database connection, if the callable opened one, is handed
+    back when it finishes.
+    """
+    succeeded = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, fn, *args, parent=None, **kwargs):
+        super().__init__(parent)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            logger.error(f"Background task {getattr(self.fn, '__name__', self.fn)} failed: {e}")
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+        finally:
+            db.close()
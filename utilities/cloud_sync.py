@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+from peewee import chunked
+from requests.adapters import HTTPAdapter
+import datetime
+import json
+import requests
+import threading
+import uuid
+import zlib
+from db.database import db, Attendance, CloudBatch
+from utilities.constants import (CLOUD_SYNC_BATCH_SIZE, CLOUD_SYNC_TIMEOUT, CLOUD_SYNC_CONCURRENCY, CLOUD_SYNC_MAX_RPS,
+                                 CLOUD_SYNC_RETRY_ATTEMPTS, CLOUD_SYNC_RETRY_BASE_DELAY, CLOUD_SYNC_RETRY_MAX_DELAY,
+                                 CLOUD_SYNC_STREAM_BLOCK_SIZE, CLOUD_SYNC_COMPRESSION_LEVEL)
+from utilities.logger import logger
+from utilities.resilience import RetryPolicy, TokenBucket
+
+
+def attendance_payload(record):
+    """JSON-ready form of an attendance row as the cloud API expects it."""
+    return {
+        "id": record["id"],
+        "user": record["user"],
+        "uid": record["uid"],
+        "timestamp": record["timestamp"].isoformat(),
+        "status": record["status"],
+        "punch": record["punch"],
+        "created_at": record["created_at"].isoformat() if record["created_at"] else None
+    }
+
+
+class NDJSONGzipStream:
+    """Iterate a query lazily and yield it as gzip-compressed NDJSON, one record per line.
+
+    Only one compressed block (about block_size bytes) is held at a time, so memory use
+    does not depend on how many rows the query returns. After the stream is consumed,
+    count and size give the records and compressed bytes that were sent.
+    """
+
+    def __init__(self, rows, block_size=CLOUD_SYNC_STREAM_BLOCK_SIZE):
+        self.rows = rows
+        self.block_size = block_size
+        self.count = 0
+        self.size = 0
+
+    def __iter__(self):
+        compressor = zlib.compressobj(CLOUD_SYNC_COMPRESSION_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        pending = []
+        pending_size = 0
+        for record in self.rows:
+            self.count += 1
+            block = compressor.compress(json.dumps(attendance_payload(record), separators=(",", ":")).encode() + b"\n")
+            if block:
+                pending.append(block)
+                pending_size += len(block)
+            if pending_size >= self.block_size:
+                self.size += pending_size
+                yield b"".join(pending)
+                pending, pending_size = [], 0
+        pending.append(compressor.flush())
+        self.size += pending_size + len(pending[-1])
+        yield b"".join(pending)
+
+
+class CloudSync:
+    """Post attendance to the cloud through an outbox.
+
+    Attendance.synced_at is the outbox marker: rows where it is null have not been
+    delivered. Pending rows are split into batches of batch_size by id range and each
+    batch is streamed as gzip-compressed NDJSON over a pooled keep-alive session.
+    Batches go out on a pool of concurrency workers, held to max_rps requests per
+    second by a token bucket, and are retried with backoff. Every batch carries an
+    Idempotency-Key, saved in cloud_batches with its id range before the batch is
+    first posted. Until the cloud acknowledges it, later runs send the same range
+    under the same key, so a request the server did process is recognised rather
+    than stored twice, even if the ack was lost and new rows have arrived since.
+
+    A batch is marked delivered as soon as the server answers it with a 2xx status.
+    When a batch fails for good, no new batches are started; acknowledged ones stay
+    delivered, so the next run resumes with only what is still pending.
+    """
+
+    def __init__(self, api_url, batch_size=CLOUD_SYNC_BATCH_SIZE, concurrency=CLOUD_SYNC_CONCURRENCY,
+                 max_rps=CLOUD_SYNC_MAX_RPS, timeout=CLOUD_SYNC_TIMEOUT, retry_policy=None, session=None):
+        self.api_url = api_url
+        self.url = f"{api_url.rstrip('/')}/attendance"
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(max_rps)
+        self.retry_policy = retry_policy or RetryPolicy(CLOUD_SYNC_RETRY_ATTEMPTS, CLOUD_SYNC_RETRY_BASE_DELAY,
+                                                        CLOUD_SYNC_RETRY_MAX_DELAY)
+        self.session = session or self._create_session()
+        self.last_summary = {}
+        self._lock = threading.Lock()
+        self._aborted = threading.Event()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+        return session
+
+    def close(self):
+        self.session.close()
+
+    def pending_count(self):
+        return Attendance.select().where(Attendance.synced_at.is_null()).count()
+
+    def pending_batches(self):
+        """Return (key, first_id, last_id, count) batches: unacknowledged ones first, then new ones.
+
+        New batches cover pending rows past the saved ones in ranges of at most
+        batch_size rows and are saved before they are returned.
+        """
+        batches = list(CloudBatch.select(CloudBatch.key, CloudBatch.first_id, CloudBatch.last_id, CloudBatch.count)
+                       .order_by(CloudBatch.first_id).tuples())
+        after = max((last_id for _, _, last_id, _ in batches), default=0)
+        new_batches = []
+        first_id = last_id = None
+        count = 0
+        ids = (Attendance.select(Attendance.id).where(Attendance.synced_at.is_null() & (Attendance.id > after))
+               .order_by(Attendance.id).tuples().iterator())
+        for (record_id,) in ids:
+            if first_id is None:
+                first_id = record_id
+            last_id = record_id
+            count += 1
+            if count == self.batch_size:
+                new_batches.append((uuid.uuid4().hex, first_id, last_id, count))
+                first_id, count = None, 0
+        if count:
+            new_batches.append((uuid.uuid4().hex, first_id, last_id, count))
+        with db.atomic():
+            for chunk in chunked(new_batches, 100):
+                CloudBatch.insert_many(chunk, fields=[CloudBatch.key, CloudBatch.first_id, CloudBatch.last_id,
+                                                      CloudBatch.count]).execute()
+        return batches + new_batches
+
+    def batch_rows(self, first_id, last_id):
+        """Lazily iterate the pending rows of one batch, oldest first."""
+        return (Attendance.select(Attendance.id, Attendance.user, Attendance.uid, Attendance.timestamp,
+                                  Attendance.status, Attendance.punch, Attendance.created_at)
+                .where(Attendance.synced_at.is_null() & Attendance.id.between(first_id, last_id))
+                .order_by(Attendance.id)
+                .dicts()
+                .iterator())
+
+    def push(self):
+        """Send every pending attendance record on a worker thread; returns (success, message)."""
+        self.last_summary = {"records": 0, "batches": 0, "bytes": 0, "requests": 0, "pending": 0}
+        self._aborted.clear()
+        with db.connection_context():
+            batches = self.pending_batches()
+        if not batches:
+            return True, "No new attendance records to post"
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches)),
+                                thread_name_prefix="cloud-sync") as executor:
+            results = list(executor.map(self._send_batch, batches))
+
+        errors = [message for success, message in results if success is False]
+        with db.connection_context():
+            self.last_summary["pending"] = self.pending_count()
+        logger.info(f"Posted {self.last_summary['records']} attendance records to cloud in "
+                    f"{self.last_summary['batches']} batches, {self.last_summary['requests']} requests, "
+                    f"{self.last_summary['bytes']} bytes compressed; {self.last_summary['pending']} pending")
+        if errors:
+            logger.error(f"Cloud sync stopped: {errors[0]}")
+            return False, (f"{errors[0]} ({self.last_summary['records']} records delivered, "
+                           f"{self.last_summary['pending']} still pending)")
+        return True, f"Posted {self.last_summary['records']} attendance records"
+
+    def _send_batch(self, batch):
+        """Deliver one batch; returns (True|False, message), or (None, message) if it was never started."""
+        key, first_id, last_id, count = batch
+        if self._aborted.is_set():
+            return None, "Not attempted"
+
+        def attempt():
+            self.rate_limiter.acquire()
+            stream = NDJSONGzipStream(self.batch_rows(first_id, last_id))
+            try:
+                response = self.session.post(self.url, data=iter(stream), headers={"Idempotency-Key": key},
+                                             timeout=self.timeout)
+            except requests.RequestException as e:
+                return False, f"Error posting to cloud: {e}"
+            finally:
+                with self._lock:
+                    self.last_summary["requests"] += 1
+                    self.last_summary["bytes"] += stream.size
+            if not 200 <= response.status_code < 300:
+                return False, f"Failed to post to cloud: HTTP {response.status_code}"
+            return True, "Delivered"
+
+        with db.connection_context():
+            success, message, _ = self.retry_policy.call(attempt, description=f"cloud batch {first_id}-{last_id}")
+            if not success:
+                self._aborted.set()
+                return False, message
+            # Ids only grow, so every pending row in [first_id, last_id] was part of this batch
+            with db.atomic():
+                Attendance.update(synced_at=datetime.datetime.now()).where(
+                    Attendance.synced_at.is_null() & Attendance.id.between(first_id, last_id)
+                ).execute()
+                CloudBatch.delete_by_id(key)
+        with self._lock:
+            self.last_summary["records"] += count
+            self.last_summary["batches"] += 1
+        return True, message
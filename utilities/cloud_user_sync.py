@@ -0,0 +1,122 @@
+from peewee import Case, chunked
+import datetime
+import json
+import requests
+from db.database import db, User, Settings
+from utilities.constants import CLOUD_USER_PAGE_SIZE, CLOUD_USER_UPDATE_BATCH_SIZE, CLOUD_SYNC_TIMEOUT
+from utilities.logger import logger
+
+STATE_KEY = "cloud_user_sync"  # Settings row holding the incremental watermark
+
+
+class CloudUserReconciler:
+    """Fill in User.user_cloud_id from the cloud user directory.
+
+    The directory is read page by page from GET {api_url}/users, which answers
+    {"users": [{"id", "user_id", "card", "updated_at"}, ...], "next_cursor": ...}.
+    Local users are indexed once by user_id and by card, every cloud entry is matched
+    against those dictionaries (user_id first, then card), and all changed mappings are
+    written in batched CASE updates inside a single transaction, so no request or
+    query is made per user.
+
+    After a successful run the newest updated_at seen is stored, and the next run only
+    asks for cloud users changed since then. A full pass is made instead when there is
+    no watermark yet, when full=True, or when local users without a cloud ID have been
+    added or edited since the last run.
+    """
+
+    def __init__(self, api_url, page_size=CLOUD_USER_PAGE_SIZE, timeout=CLOUD_SYNC_TIMEOUT, session=None):
+        self.url = f"{api_url.rstrip('/')}/users"
+        self.page_size = page_size
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.last_summary = {}
+
+    def reconcile(self, full=False):
+        """Run one reconciliation on a worker thread; returns (success, message)."""
+        with db.connection_context():
+            return self._reconcile(full)
+
+    def _reconcile(self, full):
+        self.last_summary = {"records": 0, "pages": 0, "matched": 0, "updated": 0, "unmatched": 0, "full": False}
+        started_at = datetime.datetime.now()
+        state = self.load_state()
+        updated_since = None if full or self._needs_full_pass(state) else state.get("updated_since")
+        self.last_summary["full"] = updated_since is None
+
+        users = list(User.select(User.uid, User.user_id, User.card, User.user_cloud_id))
+        by_user_id = {user.user_id: user for user in users}
+        by_card = {}
+        for user in users:
+            if user.card:
+                # A card shared by several local users cannot identify any of them
+                by_card[user.card] = None if user.card in by_card else user
+
+        mappings = {}  # uid -> cloud id
+        newest = updated_since
+        try:
+            for page in self.fetch_pages(updated_since):
+                self.last_summary["pages"] += 1
+                for entry in page:
+                    self.last_summary["records"] += 1
+                    if entry.get("updated_at") and (newest is None or entry["updated_at"] > newest):
+                        newest = entry["updated_at"]
+                    user = by_user_id.get(entry.get("user_id"))
+                    if user is None and entry.get("card"):
+                        user = by_card.get(str(entry["card"]))
+                    if user is None:
+                        self.last_summary["unmatched"] += 1
+                        continue
+                    self.last_summary["matched"] += 1
+                    if user.user_cloud_id != entry["id"]:
+                        mappings[user.uid] = entry["id"]
+        except requests.RequestException as e:
+            logger.error(f"Error fetching cloud user directory: {e}")
+            return False, f"Error fetching cloud user directory: {e}"
+
+        with db.atomic():
+            for batch in chunked(mappings.items(), CLOUD_USER_UPDATE_BATCH_SIZE):
+                User.update(user_cloud_id=Case(User.uid, batch)).where(
+                    User.uid.in_([uid for uid, _ in batch])
+                ).execute()
+            self.save_state({"updated_since": newest, "ran_at": started_at.isoformat()})
+        self.last_summary["updated"] = len(mappings)
+
+        logger.info(f"Reconciled {self.last_summary['records']} cloud users "
+                    f"({'full' if self.last_summary['full'] else 'incremental'}): "
+                    f"{self.last_summary['matched']} matched, {self.last_summary['updated']} updated, "
+                    f"{self.last_summary['unmatched']} unmatched")
+        return True, (f"Linked {self.last_summary['updated']} users to cloud IDs "
+                      f"({self.last_summary['unmatched']} cloud users unmatched)")
+
+    def fetch_pages(self, updated_since=None):
+        """Yield the directory one page (a list of user dicts) at a time, following next_cursor."""
+        params = {"page_size": self.page_size}
+        if updated_since:
+            params["updated_since"] = updated_since
+        while True:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+            yield payload.get("users", [])
+            cursor = payload.get("next_cursor")
+            if not cursor:
+                return
+            params["cursor"] = cursor
+
+    def _needs_full_pass(self, state):
+        if not state.get("ran_at"):
+            return True
+        last_run = datetime.datetime.fromisoformat(state["ran_at"])
+        return User.select().where(User.user_cloud_id.is_null() & (User.updated_at >= last_run)).exists()
+
+    @staticmethod
+    def load_state():
+        record = Settings.select().where(Settings.key == STATE_KEY).first()
+        return json.loads(record.value) if record else {}
+
+    @staticmethod
+    def save_state(state):
+        (Settings.insert(key=STATE_KEY, value=json.dumps(state))
+         .on_conflict(conflict_target=[Settings.key], preserve=[Settings.value])
+         .execute())
@@ -0,0 +1,71 @@
+# Database
+DATABASE_PATH = "attendance.db"
+DATABASE_PROFILE = "balanced"  # Storage profile from db.database.SQLITE_PROFILES: safe, balanced or fast
+DATABASE_BUSY_TIMEOUT_MS = 30000  # How long a writer waits for another writer before "database is locked"
+DATABASE_MAX_CONNECTIONS = 32  # Pooled connections; one per concurrently active thread
+DATABASE_STALE_TIMEOUT = 300  # Seconds before an idle pooled connection is recycled
+
+# Device synchronisation
+DEVICE_TIMEOUT = 5  # Seconds before a ZK request is abandoned
+DEVICE_SYNC_MAX_WORKERS = 8  # Devices processed concurrently in a sync round
+DEVICE_PING_BEFORE_CONNECT = False  # pyzk's ICMP pre-check; fails where ping is blocked or unavailable
+USER_SYNC_DELAY_MS = 1500  # Quiet period before queued user changes are sent to devices
+USER_SYNC_RETRY_MS = 60000  # How often user changes a device missed are offered to it again
+
+# Attendance ingestion
+PUNCH_CHECK_IN = 0  # pyzk punch code for a check-in; every other code is stored as a check-out
+INGEST_BATCH_SIZE = 150  # Rows per INSERT; 6 columns x 150 rows stays under SQLite's 999-variable limit
+USER_BATCH_SIZE = 80  # Rows per user upsert; 11 columns x 80 rows stays under the same limit
+
+# Roles
+ROLE_ADMIN = 1
+ROLE_USER = 3
+
+# Device session pool
+DEVICE_POOL_MAX_SESSIONS = 32  # Open ZK sessions allowed at once across all devices
+DEVICE_POOL_IDLE_TIMEOUT = 300  # Seconds an unused session stays open before it is closed
+DEVICE_KEEPALIVE_INTERVAL = 30  # Seconds between keep-alive requests on idle sessions
+
+# Live capture
+LIVE_CAPTURE_POLL_TIMEOUT = 5  # Seconds a listener waits for an event before checking for shutdown
+LIVE_CAPTURE_FLUSH_INTERVAL = 2.0  # Longest time a captured punch waits before being written
+LIVE_CAPTURE_BATCH_SIZE = 500  # Punches written per micro-batch at most
+LIVE_CAPTURE_RECONNECT_DELAY = 10  # Seconds before a dropped listener reconnects
+
+# Device discovery
+DISCOVERY_PORT = 4370  # Default ZK TCP port probed by Quick Scan
+DISCOVERY_TIMEOUT = 0.8  # Seconds to wait for a connect or a reply from one host
+DISCOVERY_CONCURRENCY = 256  # Hosts probed at once; keeps open sockets well under typical fd limits
+DISCOVERY_MAX_HOSTS = 4096  # Largest range accepted (a /20)
+DISCOVERY_DEFAULT_CIDR = "192.168.1.0/24"  # Offered when the local subnet cannot be determined
+
+# Device health
+HEALTH_CHECK_INTERVAL = 60  # Seconds between health sweeps of every device
+HEALTH_CHECK_TIMEOUT = 2.0  # Seconds a device has to answer the health probe
+HEALTH_OFFLINE_SKIP_SECONDS = 120  # Syncs skip devices found offline by a health check this recent
+DEVICE_ONLINE = "Online"
+DEVICE_OFFLINE = "Offline"
+
+# Device resilience
+DEVICE_RETRY_ATTEMPTS = 3  # Tries per device operation before it counts as one failure
+DEVICE_RETRY_BASE_DELAY = 0.5  # Seconds; backoff doubles per retry with full jitter
+DEVICE_RETRY_MAX_DELAY = 8.0  # Upper bound on a single backoff delay
+BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failed operations that open a device's circuit breaker
+BREAKER_COOLDOWN = 300  # Seconds an open breaker refuses calls before allowing one trial
+
+# Cloud sync
+CLOUD_SYNC_BATCH_SIZE = 5000  # Attendance records streamed per POST; each POST is acknowledged as a unit
+CLOUD_SYNC_TIMEOUT = 30  # Seconds to wait for the cloud API to acknowledge one batch
+CLOUD_SYNC_CONCURRENCY = 4  # Batches uploaded at once; also the size of the keep-alive connection pool
+CLOUD_SYNC_MAX_RPS = 5  # Upload requests per second at most, including retries
+CLOUD_SYNC_RETRY_ATTEMPTS = 3  # Tries per batch before the run stops
+CLOUD_SYNC_RETRY_BASE_DELAY = 1.0  # Seconds; backoff doubles per retry with full jitter
+CLOUD_SYNC_RETRY_MAX_DELAY = 30.0  # Upper bound on a single backoff delay
+CLOUD_SYNC_STREAM_BLOCK_SIZE = 64 * 1024  # Compressed bytes buffered before a chunk is written to the socket
+CLOUD_SYNC_COMPRESSION_LEVEL = 6  # zlib level; 6 is the usual size/CPU balance
+CLOUD_USER_PAGE_SIZE = 1000  # Cloud directory entries requested per page
+CLOUD_USER_UPDATE_BATCH_SIZE = 300  # user_cloud_id mappings per CASE update; 3 variables each
+
+# Search
+SEARCH_DEBOUNCE_MS = 250  # Quiet period after the last keystroke before a list search runs
+SEARCH_SEEK_USER_FRACTION = 0.005  # Attendance search seeks punches per matching user up to this share of users, else walks by time
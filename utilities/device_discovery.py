@@ -0,0 +1,118 @@
+from struct import pack, unpack
+from zk import const
+import asyncio
+import ipaddress
+import socket
+import time
+from utilities.constants import (DISCOVERY_PORT, DISCOVERY_TIMEOUT, DISCOVERY_CONCURRENCY, DISCOVERY_MAX_HOSTS,
+                                 DISCOVERY_DEFAULT_CIDR)
+from utilities.logger import logger
+
+
+class DiscoveredDevice:
+    """A host that answered a ZK connect request during a scan."""
+
+    def __init__(self, ip_address, port, requires_password=False, latency=0.0):
+        self.ip_address = ip_address
+        self.port = port
+        self.requires_password = requires_password
+        self.latency = latency
+
+    def __repr__(self):
+        return f"<DiscoveredDevice {self.ip_address}:{self.port} password={self.requires_password}>"
+
+
+def zk_packet(command, session_id=0, reply_id=0, data=b""):
+    """Build a ZK TCP packet: the 8-byte TCP wrapper, the command header and its checksum."""
+    payload = pack("<4H", command, 0, session_id, reply_id) + data
+    if len(payload) % 2:
+        payload += b"\x00"
+    total = 0
+    for (word,) in (unpack("<H", payload[i:i + 2]) for i in range(0, len(payload), 2)):
+        total += word
+        if total > const.USHRT_MAX:
+            total -= const.USHRT_MAX
+    body = pack("<4H", command, (~total) & const.USHRT_MAX, session_id, reply_id) + data
+    return pack("<HHI", const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2, len(body)) + body
+
+
+def local_subnet():
+    """Best guess at the /24 this machine sits on, used as the default scan range."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.connect(("10.255.255.255", 1))  # UDP connect sends nothing; it only picks a route
+            address = probe.getsockname()[0]
+        return str(ipaddress.ip_network(f"{address}/24", strict=False))
+    except OSError:
+        return DISCOVERY_DEFAULT_CIDR
+
+
+class DeviceDiscovery:
+    """Sweep an IPv4 range for ZK terminals.
+
+    Every host is probed with a TCP connect followed by a ZK CMD_CONNECT request, and
+    only hosts that answer with a well-formed ACK_OK or ACK_UNAUTH reply are reported,
+    so other services listening on the same port are ignored. Probes run on asyncio
+    with a semaphore bounding the open sockets, so a /22 takes a few timeouts in total
+    rather than one timeout per host.
+    """
+
+    def __init__(self, port=DISCOVERY_PORT, timeout=DISCOVERY_TIMEOUT, concurrency=DISCOVERY_CONCURRENCY):
+        self.port = port
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+    def scan(self, cidr, skip_addresses=()):
+        """Return the ZK devices found in cidr, leaving out any address in skip_addresses."""
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+        if network.version != 4:
+            raise ValueError("Only IPv4 ranges can be scanned")
+        if network.num_addresses > DISCOVERY_MAX_HOSTS:
+            raise ValueError(f"{network} has {network.num_addresses} addresses; scan at most {DISCOVERY_MAX_HOSTS}")
+
+        skip = set(skip_addresses)
+        hosts = [str(host) for host in (network.hosts() if network.num_addresses > 2 else network)]
+        hosts = [host for host in hosts if host not in skip]
+
+        started = time.perf_counter()
+        found = [device for device in self.probe_many([(host, self.port) for host in hosts]) if device is not None]
+        logger.info(f"Scanned {len(hosts)} hosts in {network} in {time.perf_counter() - started:.2f}s, "
+                    f"found {len(found)} devices")
+        return found
+
+    def probe_many(self, addresses):
+        """Probe (host, port) pairs concurrently; returns a DiscoveredDevice or None for each, in order."""
+        return asyncio.run(self._probe_many(addresses))
+
+    async def _probe_many(self, addresses):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(host, port):
+            async with semaphore:
+                return await self.probe(host, port)
+
+        return await asyncio.gather(*(bounded(host, port) for host, port in addresses))
+
+    async def probe(self, host, port):
+        """Open a ZK session handshake with host and close it again; None if it is not a ZK device."""
+        started = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+            writer.write(zk_packet(const.CMD_CONNECT))
+            await writer.drain()
+            reply = await asyncio.wait_for(reader.readexactly(16), self.timeout)
+            magic_1, magic_2, _, code, _, session_id, _ = unpack("<HHI4H", reply)
+            if (magic_1, magic_2) != (const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2):
+                return None
+            if code not in (const.CMD_ACK_OK, const.CMD_ACK_UNAUTH):
+                return None
+            writer.write(zk_packet(const.CMD_EXIT, session_id, 1))
+            await writer.drain()
+            return DiscoveredDevice(host, port, requires_password=code == const.CMD_ACK_UNAUTH,
+                                    latency=time.perf_counter() - started)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
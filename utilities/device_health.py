@@ -0,0 +1,83 @@
+import datetime
+import threading
+from db.database import db, Device
+from utilities.constants import (HEALTH_CHECK_INTERVAL, HEALTH_CHECK_TIMEOUT, HEALTH_OFFLINE_SKIP_SECONDS,
+                                 DEVICE_ONLINE, DEVICE_OFFLINE)
+from utilities.device_discovery import DeviceDiscovery
+from utilities.logger import logger
+
+
+def probe_devices(devices=None, timeout=HEALTH_CHECK_TIMEOUT):
+    """Probe every device concurrently and store status, last-seen time and latency.
+
+    The probe is the ZK connect/exit handshake used by Quick Scan: two small packets
+    and no authentication, session setup or data transfer. Returns
+    {device_id: latency_ms or None}.
+    """
+    with db.connection_context():
+        devices = list(devices if devices is not None else Device.select())
+        if not devices:
+            return {}
+        replies = DeviceDiscovery(timeout=timeout).probe_many([(device.ip_address, device.port) for device in devices])
+
+        now = datetime.datetime.now()
+        latencies = {}
+        with db.atomic():
+            for device, reply in zip(devices, replies):
+                values = {Device.status: DEVICE_OFFLINE, Device.last_checked_at: now}
+                if reply is not None:
+                    latencies[device.id] = round(reply.latency * 1000)
+                    values.update({Device.status: DEVICE_ONLINE, Device.last_seen_at: now,
+                                   Device.latency_ms: latencies[device.id]})
+                else:
+                    latencies[device.id] = None
+                Device.update(values).where(Device.id == device.id).execute()
+
+    online = sum(1 for latency in latencies.values() if latency is not None)
+    logger.info(f"Health check: {online}/{len(latencies)} devices online")
+    return latencies
+
+
+def recently_offline(device, now=None):
+    """True if the last health check, made within HEALTH_OFFLINE_SKIP_SECONDS, found the device offline."""
+    if device.status != DEVICE_OFFLINE or device.last_checked_at is None:
+        return False
+    now = now or datetime.datetime.now()
+    return (now - device.last_checked_at).total_seconds() < HEALTH_OFFLINE_SKIP_SECONDS
+
+
+class DeviceHealthMonitor:
+    """Probe every device on a background thread every interval seconds to keep Device.status live."""
+
+    def __init__(self, interval=HEALTH_CHECK_INTERVAL):
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="device-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_running():
+            self._thread.join(HEALTH_CHECK_TIMEOUT * 2)
+        self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                probe_devices()
+            except Exception as e:
+                logger.error(f"Device health check failed: {e}")
+            self._stopped.wait(self.interval)
+
+
+# Singleton instance
+health_monitor = DeviceHealthMonitor()
@@ -1,80 +1,120 @@
-from zk import ZK, const
-from db.database import Device, User, Attendance
+from db.database import Device, User, DeletedUser
 import datetime
 from utilities.logger import logger
+from utilities.device_pool import device_pool
+from utilities.attendance_ingest import ingest_attendance
+from utilities.user_ingest import upsert_device_users, device_privilege, device_card
+
+def deleted_user_uids():
+    """Device IDs of users deleted in the app (DeletedUser tombstones) that should be removed from devices.
+
+    Tombstones are matched on User.user_id: one is skipped once its user ID is back in
+    use, or once its device ID has been handed to another local user.
+    """
+    tombstones = DeletedUser.select(DeletedUser.uid).where(
+        DeletedUser.user_id.not_in(User.select(User.user_id)) &
+        DeletedUser.uid.not_in(User.select(User.uid))
+    )
+    return [uid for (uid,) in tombstones.tuples()]
+
 
 class DeviceManager:
     def __init__(self, device):
         self.device = device
         self.zk = None
+        self.session_failed = False  # Set when an operation fails so its session is not reused
+        self.connect_failed = False  # Set when the device could not be reached at all
+        self.last_summary = {}  # Structured counts from the most recent operation
 
     def connect(self):
-        """Connect to the device using pyzk."""
+        """Check out a connected session for the device from the shared session pool."""
+        self.session_failed = self.connect_failed = False
         try:
-            self.zk = ZK(self.device.ip_address, port=self.device.port, password=int(self.device.password), timeout=5)
-            conn = self.zk.connect()
-            if conn:
-                logger.info(f"Connected to device {self.device.ip_address}")
-                return True
-            return False
+            self.zk = device_pool.acquire(self.device)
+            return True
         except Exception as e:
+            self.connect_failed = True
             logger.error(f"Failed to connect to device {self.device.ip_address}: {e}")
             return False
 
     def disconnect(self):
-        """Disconnect from the device."""
+        """Return the session to the pool, closing it if the operation failed."""
         if self.zk:
-            try:
-                self.zk.disconnect()
-                logger.info(f"Disconnected from device {self.device.ip_address}")
-            except Exception as e:
-                logger.error(f"Error disconnecting from device {self.device.ip_address}: {e}")
-            finally:
-                self.zk = None
-
-    def pull_attendance(self):
-        """Pull attendance data from the device and store it in the local database."""
+            device_pool.release(self.device, discard=self.session_failed)
+            self.zk = None
+
+    def pull_attendance(self, full=False):
+        """Pull new attendance data from the device and store it in the local database.
+
+        Only records past the device's sync watermark are ingested, and the download is
+        skipped entirely when the device log size hasn't changed since the last pull.
+        Records for users not known locally are held by ingest_attendance until the user
+        appears. Pass full=True to ignore the watermark and re-process the whole log.
+        """
+        self.last_summary = {"records": 0}
         if not self.connect():
             return False, "Failed to connect to device"
 
         try:
+            self.zk.read_sizes()
+            record_count = self.zk.records
+            if not full and record_count == self.device.last_record_count:
+                self._save_watermark(record_count, self.device.last_attendance_at, self.device.last_record_at)
+                return True, "No new attendance data found"
+
             attendances = self.zk.get_attendance()
-            if not attendances:
+            last_record_at = attendances[-1].timestamp if attendances else None
+            new_attendances = attendances if full else self._records_past_watermark(attendances)
+            if not new_attendances:
+                self._save_watermark(len(attendances), self.device.last_attendance_at, last_record_at)
                 return True, "No new attendance data found"
 
-            for att in attendances:
-                user = User.get_or_none(User.uid == att.user_id)
-                if not user:
-                    logger.warning(f"User with UID {att.user_id} not found in database")
-                    continue
-
-                # Check for duplicate attendance records
-                existing = Attendance.get_or_none(
-                    (Attendance.uid == att.user_id) &
-                    (Attendance.timestamp == att.timestamp) &
-                    (Attendance.status == att.status)
-                )
-                if existing:
-                    continue
-
-                Attendance.create(
-                    user=user,
-                    timestamp=att.timestamp,
-                    status="Check-In" if att.punch == const.CHECK_IN else "Check-Out",
-                    punch="IN" if att.punch == const.CHECK_IN else "OUT",
-                    uid=att.user_id,
-                    created_at=datetime.datetime.now()
-                )
-            logger.info(f"Pulled {len(attendances)} attendance records from device {self.device.ip_address}")
-            return True, f"Pulled {len(attendances)} attendance records"
+            counts = ingest_attendance(new_attendances)
+            latest = max(att.timestamp for att in new_attendances)
+            if self.device.last_attendance_at and self.device.last_attendance_at > latest:
+                latest = self.device.last_attendance_at
+            self._save_watermark(len(attendances), latest, last_record_at)
+
+            self.last_summary.update(counts, records=len(new_attendances))
+            logger.info(f"Pulled {len(new_attendances)} attendance records from device {self.device.ip_address}: "
+                        f"{counts['inserted']} inserted, {counts['duplicates']} duplicates, "
+                        f"{counts['unknown_users']} unknown users")
+            return True, f"Pulled {len(new_attendances)} attendance records"
         except Exception as e:
+            self.session_failed = True
             logger.error(f"Error pulling attendance from device {self.device.ip_address}: {e}")
             return False, f"Error pulling attendance: {e}"
         finally:
             self.disconnect()
 
+    def _records_past_watermark(self, attendances):
+        """Return the records appended to the device log since the last pull."""
+        seen = self.device.last_record_count or 0
+        if seen and len(attendances) >= seen and attendances[seen - 1].timestamp == self.device.last_record_at:
+            # The log was only appended to since the last pull, so everything after the old size is new
+            return attendances[seen:]
+        if self.device.last_attendance_at:
+            # The log was cleared or rotated on the device (it may since have grown past the
+            # old size); fall back to the timestamp mark
+            return [att for att in attendances if att.timestamp >= self.device.last_attendance_at]
+        return attendances
+
+    def _save_watermark(self, record_count, last_attendance_at, last_record_at):
+        now = datetime.datetime.now()
+        Device.update(
+            last_record_count=record_count,
+            last_attendance_at=last_attendance_at,
+            last_record_at=last_record_at,
+            last_synced_at=now
+        ).where(Device.id == self.device.id).execute()
+        self.device.last_record_count = record_count
+        self.device.last_attendance_at = last_attendance_at
+        self.device.last_record_at = last_record_at
+        self.device.last_synced_at = now
+
     def pull_users(self):
         """Pull users from the device and store them in the local database."""
+        self.last_summary = {"records": 0}
         if not self.connect():
             return False, "Failed to connect to device"
 
@@ -83,76 +123,140 @@ class DeviceManager:
             if not users:
                 return True, "No users found on device"
 
-            for user in users:
-                # Check if user already exists in the database
-                existing_user = User.get_or_none(User.uid == user.user_id)
-                if existing_user:
-                    # Update existing user
-                    existing_user.name = user.name or existing_user.name
-                    existing_user.role = user.privilege
-                    existing_user.password = user.password or existing_user.password
-                    existing_user.card = user.card or existing_user.card
-                    existing_user.device = self.device
-                    existing_user.updated_at = datetime.datetime.now()
-                    existing_user.save()
-                else:
-                    # Create new user
-                    User.create(
-                        uid=user.user_id,
-                        name=user.name or f"User_{user.user_id}",
-                        role=user.privilege,
-                        password=user.password,
-                        group_id=None,
-                        user_id=f"U{user.user_id:03d}",
-                        card=user.card,
-                        user_cloud_id=None,
-                        device=self.device,
-                        created_at=datetime.datetime.now(),
-                        updated_at=datetime.datetime.now()
-                    )
-            logger.info(f"Pulled {len(users)} users from device {self.device.ip_address}")
+            counts = upsert_device_users(self.device, users)
+            self.last_summary.update(counts)
+            self.last_summary["records"] = len(users)
+            logger.info(f"Pulled {len(users)} users from device {self.device.ip_address}: "
+                        f"{counts['inserted']} inserted, {counts['updated']} updated, "
+                        f"{counts['unchanged']} unchanged, {counts['skipped']} skipped")
             return True, f"Pulled {len(users)} users"
         except Exception as e:
+            self.session_failed = True
             logger.error(f"Error pulling users from device {self.device.ip_address}: {e}")
             return False, f"Error pulling users: {e}"
         finally:
             self.disconnect()
 
-    def push_users(self):
-        """Push users from the local database to the device."""
+    def push_users(self, prune=False):
+        """Push local users to the device, sending only the differences.
+
+        The device roster is fetched once and compared field by field (name, privilege,
+        password, card) with the local users assigned to this device or to no device.
+        Missing users are added and changed users are rewritten. With prune=True, users
+        deleted in the app are also removed from the device; users enrolled directly on
+        the device are never touched.
+        """
+        self.last_summary = {"records": 0, "added": 0, "updated": 0, "removed": 0, "unchanged": 0}
         if not self.connect():
             return False, "Failed to connect to device"
 
         try:
-            users = User.select().where(User.device == self.device)
-            if not users:
-                return True, "No users to push"
-
-            for user in users:
-                # Check if user already exists on the device
-                device_users = self.zk.get_users()
-                if any(device_user.user_id == user.uid for device_user in device_users):
-                    # Update existing user on device
-                    self.zk.set_user(
-                        user_id=user.uid,
-                        name=user.name,
-                        privilege=user.role,
-                        password=user.password or "",
-                        card=user.card or ""
-                    )
-                else:
-                    # Add new user to device
-                    self.zk.set_user(
-                        user_id=user.uid,
-                        name=user.name,
-                        privilege=user.role,
-                        password=user.password or "",
-                        card=user.card or ""
-                    )
-            logger.info(f"Pushed {len(users)} users to device {self.device.ip_address}")
-            return True, f"Pushed {len(users)} users"
+            roster = {device_user.user_id: device_user for device_user in self.zk.get_users()}
+            users = User.select().where((User.device == self.device) | (User.device.is_null()))
+            summary = self.last_summary
+
+            if prune:
+                self._prune_deleted(roster, summary)
+
+            self._apply_upserts(users, roster, summary)
+
+            summary["records"] = summary["added"] + summary["updated"]
+            logger.info(f"Pushed {summary['records']} users to device {self.device.ip_address}: "
+                        f"{summary['added']} added, {summary['updated']} updated, "
+                        f"{summary['removed']} removed, {summary['unchanged']} unchanged")
+            return True, (f"Pushed {summary['records']} users ({summary['added']} added, "
+                          f"{summary['updated']} updated, {summary['removed']} removed)")
         except Exception as e:
+            self.session_failed = True
             logger.error(f"Error pushing users to device {self.device.ip_address}: {e}")
             return False, f"Error pushing users: {e}"
         finally:
-            self.disconnect()
\ No newline at end of file
+            self.disconnect()
+
+    def sync_users(self, upsert_uids=(), delete_uids=()):
+        """Apply a batch of local user changes to the device in a single session.
+
+        Upserted users are written only if they belong on this device (assigned to it or
+        to no device) and differ from the roster; deleted users are removed if present.
+        """
+        self.last_summary = {"records": 0, "added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        if not upsert_uids and not delete_uids:
+            return True, "No user changes to sync"
+        if not self.connect():
+            return False, "Failed to connect to device"
+
+        try:
+            roster = {device_user.user_id: device_user for device_user in self.zk.get_users()}
+            summary = self.last_summary
+
+            for uid in delete_uids:
+                device_user = roster.get(str(uid))
+                if device_user is not None:
+                    self.zk.delete_user(uid=device_user.uid)
+                    summary["removed"] += 1
+
+            if upsert_uids:
+                users = User.select().where(
+                    User.uid.in_(list(upsert_uids)) &
+                    ((User.device == self.device) | (User.device.is_null()))
+                )
+                self._apply_upserts(users, roster, summary)
+
+            summary["records"] = summary["added"] + summary["updated"] + summary["removed"]
+            logger.info(f"Synced {summary['records']} user changes to device {self.device.ip_address}: "
+                        f"{summary['added']} added, {summary['updated']} updated, {summary['removed']} removed")
+            return True, f"Synced {summary['records']} user changes"
+        except Exception as e:
+            self.session_failed = True
+            logger.error(f"Error syncing users to device {self.device.ip_address}: {e}")
+            return False, f"Error syncing users: {e}"
+        finally:
+            self.disconnect()
+
+    def _prune_deleted(self, roster, summary):
+        """Remove users the app deleted (see deleted_user_uids) from the device."""
+        for uid in deleted_user_uids():
+            device_user = roster.pop(str(uid), None)
+            if device_user is not None:
+                self.zk.delete_user(uid=device_user.uid)
+                summary["removed"] += 1
+
+    def _apply_upserts(self, users, roster, summary):
+        """Add or rewrite the given users wherever they differ from the device roster."""
+        for user in users:
+            device_user = roster.get(str(user.uid))
+            if device_user is None:
+                self._write_user(user)
+                summary["added"] += 1
+            elif self._device_record(user) != (device_user.name, device_user.privilege,
+                                               device_user.password, device_user.card):
+                self._write_user(user, device_uid=device_user.uid)
+                summary["updated"] += 1
+            else:
+                summary["unchanged"] += 1
+
+    def _device_record(self, user):
+        """Return the (name, privilege, password, card) the device will hold for a local user.
+
+        Values are truncated and converted the same way the device stores them, so they
+        compare equal to an unchanged roster entry.
+        """
+        name_size, password_size = (8, 5) if self.zk.user_packet_size == 28 else (24, 8)
+        encoding = self.zk.encoding
+        name = user.name.encode(encoding, errors="ignore")[:name_size].decode(encoding, errors="ignore").strip()
+        password = (user.password or "").encode(encoding, errors="ignore")[:password_size].decode(encoding, errors="ignore")
+        return name, device_privilege(user.role), password, device_card(user.card)
+
+    def _write_user(self, user, device_uid=None):
+        """Create (device_uid=None) or overwrite a user on the connected device."""
+        name, privilege, password, card = self._device_record(user)
+        self.zk.set_user(
+            uid=device_uid,
+            name=name,
+            privilege=privilege,
+            password=password,
+            group_id=str(user.group_id) if user.group_id is not None else "",
+            user_id=str(user.uid),
+            card=card
+        )
+
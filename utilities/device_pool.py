@@ -0,0 +1,180 @@
+from zk import ZK
+import threading
+import time
+from utilities.constants import (DEVICE_TIMEOUT, DEVICE_PING_BEFORE_CONNECT, DEVICE_POOL_MAX_SESSIONS,
+                                 DEVICE_POOL_IDLE_TIMEOUT, DEVICE_KEEPALIVE_INTERVAL)
+from utilities.logger import logger
+
+
+class DeviceSession:
+    """One open ZK connection to a device; used by a single caller at a time."""
+
+    def __init__(self, device):
+        self.device_id = device.id
+        self.address = None
+        self.zk = None
+        self.in_use = False
+        self.last_used = time.monotonic()
+        self.last_verified = 0.0
+
+    def is_connected(self):
+        return self.zk is not None and self.zk.is_connect
+
+    def open(self, device):
+        self.close()
+        self.address = (device.ip_address, device.port, device.password)
+        self.zk = ZK(device.ip_address, port=device.port, password=int(device.password), timeout=DEVICE_TIMEOUT,
+                     ommit_ping=not DEVICE_PING_BEFORE_CONNECT)
+        self.zk.connect()
+        self.last_verified = time.monotonic()
+        logger.info(f"Connected to device {device.ip_address}")
+
+    def ping(self):
+        """Cheap round trip that keeps the session alive and proves it still works."""
+        self.zk.get_time()
+        self.last_verified = time.monotonic()
+
+    def close(self):
+        if self.zk is None:
+            return
+        try:
+            if self.zk.is_connect:
+                self.zk.disconnect()
+            logger.info(f"Disconnected from device {self.address[0]}")
+        except Exception as e:
+            logger.error(f"Error disconnecting from device {self.address[0]}: {e}")
+        finally:
+            self.zk = None
+
+
+class DeviceSessionPool:
+    """Process-wide pool of ZK sessions keyed by Device.id.
+
+    Sessions are reused across operations instead of paying TCP setup and device
+    authentication every time. A background thread sends keep-alives on idle sessions
+    and closes those unused for longer than idle_timeout. Sessions that fail are dropped
+    and reopened on the next acquire, and at most max_sessions are open at once.
+    """
+
+    def __init__(self, max_sessions=DEVICE_POOL_MAX_SESSIONS, idle_timeout=DEVICE_POOL_IDLE_TIMEOUT,
+                 keepalive_interval=DEVICE_KEEPALIVE_INTERVAL):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self._sessions = {}
+        self._condition = threading.Condition()
+        self._keepalive_thread = None
+        self._stopped = threading.Event()
+
+    def acquire(self, device, timeout=None):
+        """Return a connected ZK instance for exclusive use until release() is called."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                session = self._sessions.get(device.id)
+                if session is not None and not session.in_use:
+                    break
+                if session is None and (len(self._sessions) < self.max_sessions or self._evict_idle_session()):
+                    session = DeviceSession(device)
+                    self._sessions[device.id] = session
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No device session available for {device.ip_address}")
+                self._condition.wait(remaining)
+            session.in_use = True
+        self._start_keepalive()
+
+        try:
+            address = (device.ip_address, device.port, device.password)
+            if not session.is_connected() or session.address != address:
+                session.open(device)
+            elif time.monotonic() - session.last_verified > self.keepalive_interval:
+                try:
+                    session.ping()
+                except Exception as e:
+                    logger.info(f"Reconnecting stale session to device {device.ip_address}: {e}")
+                    session.open(device)
+        except Exception:
+            self.release(device, discard=True)
+            raise
+        return session.zk
+
+    def release(self, device, discard=False):
+        """Hand a session back to the pool; discard=True closes it because it may be broken."""
+        with self._condition:
+            session = self._sessions.get(device.id)
+            if session is None:
+                return
+            if discard:
+                del self._sessions[device.id]
+            else:
+                session.in_use = False
+                session.last_used = time.monotonic()
+            self._condition.notify_all()
+        if discard:
+            session.close()
+
+    def close_all(self):
+        """Close every idle session and stop the keep-alive thread."""
+        self._stopped.set()
+        with self._condition:
+            idle = [session for session in self._sessions.values() if not session.in_use]
+            for session in idle:
+                del self._sessions[session.device_id]
+        for session in idle:
+            session.close()
+
+    def _evict_idle_session(self):
+        """Close the least recently used idle session to make room; caller holds the lock."""
+        idle = [session for session in self._sessions.values() if not session.in_use]
+        if not idle:
+            return False
+        session = min(idle, key=lambda s: s.last_used)
+        del self._sessions[session.device_id]
+        threading.Thread(target=session.close, daemon=True).start()
+        return True
+
+    def _start_keepalive(self):
+        with self._condition:
+            if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+                return
+            self._stopped.clear()
+            self._keepalive_thread = threading.Thread(target=self._keepalive_loop, name="device-keepalive", daemon=True)
+            self._keepalive_thread.start()
+
+    def _keepalive_loop(self):
+        while not self._stopped.wait(self.keepalive_interval):
+            now = time.monotonic()
+            with self._condition:
+                idle = [session for session in self._sessions.values() if not session.in_use]
+                expired = [session for session in idle if now - session.last_used > self.idle_timeout]
+                for session in expired:
+                    del self._sessions[session.device_id]
+                to_ping = [session for session in idle if session not in expired]
+                for session in to_ping:
+                    session.in_use = True
+                if expired:
+                    self._condition.notify_all()
+
+            for session in expired:
+                session.close()
+            for session in to_ping:
+                try:
+                    session.ping()
+                    broken = False
+                except Exception as e:
+                    logger.warning(f"Keep-alive failed for device {session.address[0]}: {e}")
+                    broken = True
+                with self._condition:
+                    if broken:
+                        self._sessions.pop(session.device_id, None)
+                    else:
+                        session.in_use = False
+                    self._condition.notify_all()
+                if broken:
+                    session.close()
+
+
+# Singleton instance
+device_pool = DeviceSessionPool()
@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import time
+from db.database import db, Device, DeletedUser
+from utilities.device_health import recently_offline
+from utilities.device_manager import DeviceManager
+from utilities.constants import DEVICE_SYNC_MAX_WORKERS
+from utilities.resilience import RetryPolicy, DeviceCircuitBreaker
+from utilities.logger import logger
+
+
+class DeviceSyncResult:
+    """Outcome of one device operation within a sync round."""
+
+    def __init__(self, device, success, message, records=0, duration=0.0, error=None, summary=None):
+        self.device = device
+        self.success = success
+        self.message = message
+        self.records = records
+        self.duration = duration
+        self.error = error
+        self.summary = summary or {}
+
+    def __repr__(self):
+        return (f"<DeviceSyncResult {self.device.ip_address} success={self.success} "
+                f"records={self.records} duration={self.duration:.2f}s>")
+
+
+class DeviceSyncEngine:
+    """Run DeviceManager operations against many devices on a bounded worker pool.
+
+    Each device gets its own DeviceManager and its own database connection, so one
+    slow or unreachable terminal only occupies a single worker and the round takes
+    as long as the slowest device rather than the sum of all of them. Devices the
+    health monitor found offline moments ago are skipped instead of waiting out
+    their connect timeout. Operations that fail after connecting are retried with
+    backoff; a device that cannot be reached fails at once rather than waiting out its
+    connect timeout on every retry, and counts toward its circuit breaker. A device
+    whose circuit breaker is open is refused immediately.
+    """
+
+    def __init__(self, max_workers=DEVICE_SYNC_MAX_WORKERS, retry_policy=None):
+        self.max_workers = max_workers
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def run(self, operation, devices=None, include_offline=False, **kwargs):
+        """Call DeviceManager.<operation>(**kwargs) on every device and return one result per device."""
+        with db.connection_context():
+            devices = list(devices if devices is not None else Device.select())
+        if not devices:
+            return []
+
+        started = time.perf_counter()
+        reachable = [device for device in devices if include_offline or not recently_offline(device)]
+        results = {}
+        if reachable:
+            workers = min(self.max_workers, len(reachable))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="device-sync") as executor:
+                for result in executor.map(lambda device: self._run_one(device, operation, kwargs), reachable):
+                    results[result.device.id] = result
+        for device in devices:
+            if device.id not in results:
+                message = "Skipped: device was offline at the last health check"
+                results[device.id] = DeviceSyncResult(device=device, success=False, message=message, error=message)
+        results = [results[device.id] for device in devices]
+
+        succeeded = sum(1 for result in results if result.success)
+        logger.info(f"{operation} finished on {succeeded}/{len(results)} devices "
+                    f"({len(devices) - len(reachable)} skipped as offline) in {time.perf_counter() - started:.2f}s")
+        return results
+
+    def pull_attendance(self, devices=None, full=False):
+        return self.run("pull_attendance", devices, full=full)
+
+    def pull_users(self, devices=None):
+        return self.run("pull_users", devices)
+
+    def push_users(self, devices=None, prune=False):
+        """Push users to the devices; with prune=True also remove users deleted in the app.
+
+        Once a pruning push has succeeded on every device, the tombstones it applied are dropped.
+        """
+        started = datetime.datetime.now()
+        results = self.run("push_users", devices, prune=prune)
+        if prune and devices is None and all(result.success for result in results):
+            with db.connection_context():
+                DeletedUser.delete().where(DeletedUser.deleted_at <= started).execute()
+        return results
+
+    def sync_users(self, upsert_uids=(), delete_uids=(), devices=None):
+        return self.run("sync_users", devices, upsert_uids=upsert_uids, delete_uids=delete_uids)
+
+    def _run_one(self, device, operation, kwargs):
+        manager = DeviceManager(device)
+        breaker = DeviceCircuitBreaker(device)
+        started = time.perf_counter()
+        with db.connection_context():
+            if breaker.is_open():
+                message = f"Skipped: circuit breaker open until {breaker.retry_at():%H:%M:%S}"
+                return DeviceSyncResult(device=device, success=False, message=message, error=message)
+
+            # A half-open breaker gets a single trial rather than a full round of retries
+            attempts = 1 if breaker.is_half_open() else None
+            success, message, tries = self.retry_policy.call(
+                lambda: getattr(manager, operation)(**kwargs),
+                attempts=attempts,
+                description=f"{operation} on device {device.ip_address}",
+                retryable=lambda message: not manager.connect_failed
+            )
+            if success:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+        duration = time.perf_counter() - started
+        summary = dict(manager.last_summary, attempts=tries)
+        return DeviceSyncResult(
+            device=device,
+            success=success,
+            message=message,
+            records=manager.last_summary.get("records", 0),
+            duration=duration,
+            error=None if success else message,
+            summary=summary
+        )
@@ -0,0 +1,222 @@
+from zk import ZK
+import queue
+import threading
+import time
+from db.database import db, Device
+from utilities.attendance_ingest import ingest_attendance
+from utilities.constants import (DEVICE_TIMEOUT, DEVICE_PING_BEFORE_CONNECT, LIVE_CAPTURE_POLL_TIMEOUT,
+                                 LIVE_CAPTURE_FLUSH_INTERVAL, LIVE_CAPTURE_BATCH_SIZE, LIVE_CAPTURE_RECONNECT_DELAY)
+from utilities.logger import logger
+
+
+class LiveCaptureListener:
+    """One device's listener thread and the ZK session it is currently capturing on."""
+
+    def __init__(self, device, target):
+        self.device = device
+        self.address = self.address_of(device)
+        self.stopped = threading.Event()
+        self.zk = None
+        self.thread = threading.Thread(target=target, args=(self,), name=f"live-capture-{device.id}", daemon=True)
+
+    @staticmethod
+    def address_of(device):
+        """Connection details; a listener is restarted when these change."""
+        return device.ip_address, device.port, device.password
+
+    def stop(self):
+        """Ask the listener to exit; it notices within one poll timeout."""
+        self.stopped.set()
+        zk = self.zk
+        if zk is not None:
+            zk.end_live_capture = True
+
+
+class LiveCaptureService:
+    """Stream punches from every device as they happen and store them in micro-batches.
+
+    One lightweight listener thread per device holds a dedicated ZK session in live
+    capture mode and pushes events onto a shared buffer. A single writer thread drains
+    the buffer every flush_interval (or as soon as batch_size events are waiting) and
+    stores them through ingest_attendance, so the usual (uid, timestamp, status) dedupe
+    applies and a later full pull does not create duplicates. reconcile() keeps the
+    listeners in step with the device list while capture is running.
+    """
+
+    def __init__(self, flush_interval=LIVE_CAPTURE_FLUSH_INTERVAL, batch_size=LIVE_CAPTURE_BATCH_SIZE,
+                 poll_timeout=LIVE_CAPTURE_POLL_TIMEOUT, reconnect_delay=LIVE_CAPTURE_RECONNECT_DELAY):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self._events = queue.Queue()
+        self._stopped = threading.Event()  # Replaced on every start, so a draining writer keeps its own
+        self._lock = threading.RLock()
+        self._listeners = {}  # device_id -> LiveCaptureListener
+        self._retired = []  # Listeners told to stop that may not have exited yet
+        self._device_ids = None  # Devices to capture from; None for all
+        self._pending_start = None  # (devices,) of a start() deferred until retired listeners exit
+        self._writer = None
+        self._reaper = None
+
+    def is_running(self):
+        return self._writer is not None and self._writer.is_alive()
+
+    def start(self, devices=None):
+        """Start a listener for every device (or the given ones) plus the batch writer.
+
+        Never blocks. While listeners from the previous run are still shutting down it
+        returns False and starts once they have exited, so no device ever gets a second
+        capture session.
+        """
+        with self._lock:
+            if self.is_running():
+                return True
+            self._retired = [listener for listener in self._retired if listener.thread.is_alive()]
+            if self._retired:
+                self._pending_start = (devices,)
+                self._reap()
+                logger.info(f"Live capture will start once {len(self._retired)} listeners "
+                            f"from the previous run have exited")
+                return False
+            self._stopped = threading.Event()
+            self._device_ids = None if devices is None else {device.id for device in devices}
+            self._writer = threading.Thread(target=self._write_loop, args=(self._stopped,),
+                                            name="live-capture-writer", daemon=True)
+            self._writer.start()
+            self.reconcile()
+            logger.info(f"Live capture started on {len(self._listeners)} devices")
+            return True
+
+    def stop(self, wait=False):
+        """Tell all listeners to stop; the writer flushes whatever is still buffered and exits.
+
+        Returns at once; the listeners are reaped on a background thread. Pass wait=True
+        (at shutdown) to block until the buffered punches are written.
+        """
+        with self._lock:
+            self._pending_start = None
+            if not self.is_running():
+                return
+            writer, self._writer = self._writer, None
+            self._stopped.set()
+            for device_id in list(self._listeners):
+                self._retire(device_id)
+        if wait:
+            writer.join()
+        logger.info("Live capture stopped")
+
+    def reconcile(self):
+        """Start listeners for new devices, stop those of removed devices and restart edited ones."""
+        with self._lock:
+            if not self.is_running():
+                return
+            with db.connection_context():
+                query = Device.select()
+                if self._device_ids is not None:
+                    query = query.where(Device.id.in_(list(self._device_ids)))
+                devices = {device.id: device for device in query}
+
+            for device_id, listener in list(self._listeners.items()):
+                device = devices.get(device_id)
+                if device is None or LiveCaptureListener.address_of(device) != listener.address:
+                    self._retire(device_id)
+            for device_id, device in devices.items():
+                if device_id not in self._listeners:
+                    listener = LiveCaptureListener(device, self._listen)
+                    self._listeners[device_id] = listener
+                    listener.thread.start()
+
+    def apply_settings(self, settings):
+        """Start or stop capture to match the enable_live_capture setting."""
+        if settings.get("enable_live_capture"):
+            self.start()
+        else:
+            self.stop()
+
+    def _retire(self, device_id):
+        listener = self._listeners.pop(device_id)
+        listener.stop()
+        self._retired.append(listener)
+        self._reap()
+
+    def _reap(self):
+        """Make sure a reaper thread is waiting for the retired listeners to exit."""
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name="live-capture-reaper", daemon=True)
+                self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            with self._lock:
+                self._retired = [listener for listener in self._retired if listener.thread.is_alive()]
+                if not self._retired:
+                    self._reaper = None
+                    pending, self._pending_start = self._pending_start, None
+                    break
+                listener = self._retired[0]
+            listener.thread.join(self.poll_timeout)
+        if pending is not None:
+            self.start(*pending)
+
+    def _listen(self, listener):
+        device = listener.device
+        while not listener.stopped.is_set():
+            zk = ZK(device.ip_address, port=device.port, password=int(device.password), timeout=DEVICE_TIMEOUT,
+                    ommit_ping=not DEVICE_PING_BEFORE_CONNECT)
+            try:
+                zk.connect()
+                listener.zk = zk
+                logger.info(f"Live capture listening on device {device.ip_address}")
+                for attendance in zk.live_capture(new_timeout=self.poll_timeout):
+                    if listener.stopped.is_set():
+                        zk.end_live_capture = True
+                    elif attendance is not None:
+                        self._events.put(attendance)
+            except Exception as e:
+                logger.error(f"Live capture on device {device.ip_address} dropped: {e}")
+            finally:
+                listener.zk = None
+                try:
+                    if zk.is_connect:
+                        zk.disconnect()
+                except Exception as e:
+                    logger.error(f"Error disconnecting live capture from device {device.ip_address}: {e}")
+            listener.stopped.wait(self.reconnect_delay)
+
+    def _write_loop(self, stopped):
+        while not stopped.is_set() or not self._events.empty():
+            batch = self._next_batch(stopped)
+            if not batch:
+                continue
+            try:
+                with db.connection_context():
+                    counts = ingest_attendance(batch)
+                logger.info(f"Live capture stored {counts['inserted']} of {len(batch)} punches "
+                            f"({counts['duplicates']} duplicates, {counts['unknown_users']} unknown users)")
+            except Exception as e:
+                logger.error(f"Error storing {len(batch)} live punches: {e}")
+
+    def _next_batch(self, stopped):
+        """Wait for the first event, then collect more until the batch is full or the interval ends."""
+        try:
+            batch = [self._events.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or stopped.is_set():
+                break
+            try:
+                batch.append(self._events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        while len(batch) < self.batch_size and not self._events.empty():
+            batch.append(self._events.get_nowait())
+        return batch
+
+
+# Singleton instance
+live_capture = LiveCaptureService()
@@ -0,0 +1,125 @@
+from peewee import Tuple
+from utilities.row_counts import row_counts
+
+
+class KeysetPager:
+    """Cursor (keyset) reads over a peewee query.
+
+    Rows are ordered by key_fields, the last of which must be unique (usually the primary
+    key); an aliased expression the query selects may also serve as a key. Instead of
+    OFFSET, every read is a WHERE on the key of a row already loaded, so SQLite seeks
+    straight to it through the index and the millionth row costs the same as the
+    first. first(), last() and seek() load the block a view starts
+    from into rows; after() and before() read the page adjoining any row, so the view
+    can grow its window a page at a time in either direction. One extra row is fetched
+    to learn whether more follow. Totals come from row_counts: the maintained counter of
+    count_model for an unfiltered query, otherwise a count cached until the tables it
+    reads are written.
+    """
+
+    def __init__(self, key_fields, page_size=100, descending=False):
+        self.key_fields = key_fields
+        self.page_size = page_size
+        self.descending = descending
+        self.query = None
+        self.count_model = None
+        self.count_query = None
+        self.rows = []
+        self.total_count = 0
+        self.has_prev = False
+        self.has_next = False
+
+    def key(self, row):
+        return tuple(getattr(row, getattr(field, "_alias", None) or field.name) for field in self.key_fields)
+
+    def reset(self, query, count_model=None, count_query=None, key_fields=None):
+        """Read query (filtered, but not ordered or limited) starting from the first page.
+
+        Pass count_model when query returns every row of that model's table, or
+        count_query when the same rows are cheaper to count through another plan.
+        key_fields replaces the ordering given to the constructor.
+        """
+        self.query = query
+        self.count_model = count_model
+        self.count_query = count_query
+        if key_fields:
+            self.key_fields = key_fields
+        self.total_count = self.count()
+        return self.first()
+
+    def count(self, condition=None):
+        if self.count_model and condition is None:
+            return row_counts.total(self.count_model)
+        query = self.query if self.count_query is None else self.count_query
+        return row_counts.count(query if condition is None else query.where(condition))
+
+    def first(self):
+        self.rows, self.has_next = self._fetch()
+        self.has_prev = False
+        return self.rows
+
+    def last(self):
+        self.rows, self.has_prev = self._fetch(forward=False)
+        self.has_next = False
+        return self.rows
+
+    def after(self, row):
+        """Return (the page following row, whether more follow it)."""
+        return self._fetch(self.key(row))
+
+    def before(self, row):
+        """Return (the page preceding row in display order, whether more precede it)."""
+        return self._fetch(self.key(row), forward=False)
+
+    def seek(self, value):
+        """Start at the first row whose leading key is value or comes after it."""
+        field = self.key_fields[0].unwrap()
+        before = field > value if self.descending else field < value
+        rows, more = self._fetch(condition=~before)
+        if not rows:
+            return self.last()
+        self.rows, self.has_next = rows, more
+        self.has_prev = self.query.where(before).exists()
+        return self.rows
+
+    def reload(self, start=None, limit=None):
+        """Re-read limit rows (one page by default) from row start onwards, e.g. after rows were added, edited or deleted.
+
+        start defaults to the first row in rows.
+        """
+        self.total_count = self.count()
+        if start is None and self.rows:
+            start = self.rows[0]
+        if start is None:
+            return self.first()
+        key = self.key(start)
+        rows, more = self._fetch(key, inclusive=True, limit=limit)
+        if not rows:
+            return self.last()
+        self.rows, self.has_next = rows, more
+        self.has_prev = self.query.where(self._beyond(key, forward=False)).exists()
+        return self.rows
+
+    def _beyond(self, key, forward=True, inclusive=False):
+        """Condition matching the rows past key in the direction of travel."""
+        columns, values = Tuple(*[field.unwrap() for field in self.key_fields]), Tuple(*key)
+        if forward != self.descending:
+            return columns >= values if inclusive else columns > values
+        return columns <= values if inclusive else columns < values
+
+    def _fetch(self, key=None, forward=True, inclusive=False, condition=None, limit=None):
+        """Read up to limit (default page_size) rows after (or before) key; returns (rows in display order, more_follow)."""
+        limit = limit or self.page_size
+        ascending = forward != self.descending
+        columns = [field.unwrap() for field in self.key_fields]
+        query = self.query.order_by(*[column.asc() if ascending else column.desc() for column in columns])
+        if key is not None:
+            condition = self._beyond(key, forward, inclusive)
+        if condition is not None:
+            query = query.where(condition)
+        rows = list(query.limit(limit + 1))
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if not forward:
+            rows.reverse()
+        return rows, more
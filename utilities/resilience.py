@@ -0,0 +1,122 @@
+import datetime
+import random
+import threading
+import time
+from db.database import Device
+from utilities.constants import (DEVICE_RETRY_ATTEMPTS, DEVICE_RETRY_BASE_DELAY, DEVICE_RETRY_MAX_DELAY,
+                                 BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN)
+from utilities.logger import logger
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n waits uniform(0, min(max_delay, base_delay * 2**n))."""
+
+    def __init__(self, attempts=DEVICE_RETRY_ATTEMPTS, base_delay=DEVICE_RETRY_BASE_DELAY,
+                 max_delay=DEVICE_RETRY_MAX_DELAY, rng=None):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = rng or random.Random()
+
+    def delay(self, retry):
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def call(self, fn, attempts=None, description="operation", retryable=None):
+        """Call fn() until it returns (True, message) or attempts run out; returns (success, message, tries).
+
+        retryable, if given, is called with the message of a failed attempt and ends
+        the retries early when it returns False.
+        """
+        attempts = attempts or self.attempts
+        for attempt in range(attempts):
+            if attempt:
+                delay = self.delay(attempt - 1)
+                logger.info(f"Retrying {description} in {delay:.2f}s (attempt {attempt + 1} of {attempts})")
+                time.sleep(delay)
+            try:
+                success, message = fn()
+            except Exception as e:
+                success, message = False, f"Unexpected error: {e}"
+            if success:
+                return True, message, attempt + 1
+            if retryable is not None and not retryable(message):
+                return False, message, attempt + 1
+        return False, message, attempts
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: acquire() blocks until one of rate tokens per second is free.
+
+    Up to burst tokens accumulate while idle. A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DeviceCircuitBreaker:
+    """Per-device circuit breaker whose state lives on the Device row, so it survives restarts.
+
+    After failure_threshold consecutive failed operations the breaker opens and calls are
+    refused without touching the network. Once cooldown seconds have passed it is half
+    open: a single attempt is allowed, which closes the breaker on success or re-opens
+    it for another cooldown on failure.
+    """
+
+    def __init__(self, device, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.device = device
+        self.failure_threshold = failure_threshold
+        self.cooldown = datetime.timedelta(seconds=cooldown)
+
+    def is_open(self, now=None):
+        opened_at = self.device.breaker_opened_at
+        return opened_at is not None and (now or datetime.datetime.now()) < opened_at + self.cooldown
+
+    def is_half_open(self, now=None):
+        return self.device.breaker_opened_at is not None and not self.is_open(now)
+
+    def retry_at(self):
+        return self.device.breaker_opened_at + self.cooldown
+
+    def record_success(self):
+        if self.device.failure_count or self.device.breaker_opened_at is not None:
+            if self.device.breaker_opened_at is not None:
+                logger.info(f"Circuit breaker closed for device {self.device.ip_address}")
+            self._save(0, None)
+
+    def record_failure(self):
+        failures = (self.device.failure_count or 0) + 1
+        opened_at = self.device.breaker_opened_at
+        if self.is_half_open() or failures >= self.failure_threshold:
+            opened_at = datetime.datetime.now()
+            logger.warning(f"Circuit breaker opened for device {self.device.ip_address} after {failures} "
+                           f"consecutive failures; retrying after {opened_at + self.cooldown:%H:%M:%S}")
+        self._save(failures, opened_at)
+
+    def reset(self):
+        self._save(0, None)
+
+    def _save(self, failure_count, breaker_opened_at):
+        Device.update(failure_count=failure_count, breaker_opened_at=breaker_opened_at).where(
+            Device.id == self.device.id
+        ).execute()
+        self.device.failure_count = failure_count
+        self.device.breaker_opened_at = breaker_opened_at
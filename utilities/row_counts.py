@@ -0,0 +1,56 @@
+import threading
+from db.database import RowCounter, MIRRORED_TABLES, table_count
+
+MAX_CACHED_COUNTS = 256  # Distinct filtered queries remembered at once
+
+
+class RowCounts:
+    """Row totals for the list screens without a COUNT(*) per page load.
+
+    Unfiltered totals come straight from the trigger-maintained row_counters table.
+    Filtered counts are cached by the query's SQL and parameters together with the
+    write versions of the tables it reads; any insert, delete or relevant update on one
+    of those tables bumps its version, and the next request counts again.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_COUNTS):
+        self.max_entries = max_entries
+        self._cache = {}  # (sql, params) -> (versions, count)
+        self._lock = threading.Lock()
+
+    def total(self, model):
+        return table_count(model)
+
+    def count(self, query):
+        sql, params = query.sql()
+        key = (sql, tuple(params))
+        # Versions are read before counting, so a write in between only makes the entry stale early
+        versions = self.versions(sql)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and cached[0] == versions:
+            return cached[1]
+
+        count = query.count()
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = (versions, count)
+        return count
+
+    @staticmethod
+    def versions(sql):
+        """Write versions of the counted tables that sql refers to, directly or through a mirror (MIRRORED_TABLES)."""
+        tables = {f'"{mirror._meta.table_name}"': source._meta.table_name for mirror, source in MIRRORED_TABLES.items()}
+        referenced = {source for mirror, source in tables.items() if mirror in sql}
+        counters = RowCounter.select(RowCounter.table_name, RowCounter.version).order_by(RowCounter.table_name)
+        return tuple((name, version) for name, version in counters.tuples()
+                     if name in referenced or f'"{name}"' in sql)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Singleton instance
+row_counts = RowCounts()
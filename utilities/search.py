@@ -0,0 +1,62 @@
+import re
+from db.database import User, Attendance, SearchLabel, UserSearch, table_count
+from utilities.constants import SEARCH_SEEK_USER_FRACTION
+
+FTS5_AVAILABLE = UserSearch.fts5_installed()
+
+
+def match_expression(text):
+    """FTS5 query matching every word of text as a prefix ("jo sm" finds "John Smith"), or None without words."""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def matching_labels(text):
+    """Status and punch values containing text, from the label vocabulary rather than the attendance table."""
+    return [label for (label,) in SearchLabel.select(SearchLabel.label).where(SearchLabel.label.contains(text)).tuples()]
+
+
+def search_users(query, text):
+    """Restrict a User query to users whose name, user ID or card matches text, best matches first.
+
+    Returns (query, key_fields) for KeysetPager: (bm25 rank, uid) with the full-text
+    index, uid alone when falling back to LIKE.
+    """
+    expression = match_expression(text) if FTS5_AVAILABLE else None
+    if expression is None:
+        return query.where(User.name.contains(text) | User.user_id.contains(text) | User.card.contains(text)), [User.uid]
+    rank = UserSearch.rank().alias("search_rank")
+    query = (query.select_extend(rank)
+             .join(UserSearch, on=(UserSearch.rowid == User.uid))
+             .where(UserSearch.match(expression)))
+    return query, [rank, User.uid]
+
+
+def search_attendance(text):
+    """Conditions restricting an Attendance query to punches matching text.
+
+    A punch matches when its user's name, user ID or card matches (through the
+    full-text index) or its status or punch contains text. Users are resolved in a
+    subquery on Attendance.uid, so neither condition needs a join to users. Returns
+    (page_condition, count_condition). When few users match, both seek their punches
+    through the uid index. When many match, or a label does, the page condition hides
+    uid from the planner so newest-first pages walk the timestamp index and stop after
+    one page instead of sorting every match. The count condition keeps the index.
+    """
+    labels = matching_labels(text)
+    expression = match_expression(text) if FTS5_AVAILABLE else None
+    if expression is None:
+        matching_users = User.select(User.uid).where(
+            User.name.contains(text) | User.user_id.contains(text) | User.card.contains(text)
+        )
+        seek = False
+    else:
+        matching_users = UserSearch.select(UserSearch.rowid).where(UserSearch.match(expression))
+        seek = not labels and matching_users.count() <= max(1, table_count(User) * SEARCH_SEEK_USER_FRACTION)
+    page_condition = (Attendance.uid if seek else Attendance.uid + 0).in_(matching_users)
+    count_condition = Attendance.uid.in_(matching_users)
+    if labels:
+        # Most punches carry a matching label, so test those cheap columns first
+        page_condition = Attendance.status.in_(labels) | Attendance.punch.in_(labels) | page_condition
+        count_condition = Attendance.status.in_(labels) | Attendance.punch.in_(labels) | count_condition
+    return page_condition, count_condition
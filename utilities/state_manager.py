@@ -1,6 +1,20 @@
 from PySide6.QtCore import QObject, Signal
 from db.database import Settings, db
 import json
+from utilities.constants import CLOUD_SYNC_CONCURRENCY, CLOUD_SYNC_MAX_RPS
+
+DEFAULT_SETTINGS = {
+    "cloud_api_url": "https://api.primesync.com/v1",
+    "username": "admin",
+    "password": "••••••••",
+    "auto_check_interval": 15,
+    "enable_auto_sync": True,
+    "periodic_sync_time": "12:00 PM",
+    "enable_periodic_sync": True,
+    "enable_live_capture": False,
+    "cloud_upload_concurrency": CLOUD_SYNC_CONCURRENCY,
+    "cloud_max_requests_per_second": CLOUD_SYNC_MAX_RPS
+}
 
 class StateManager(QObject):
     settings_changed = Signal(dict)
@@ -12,52 +26,27 @@ class StateManager(QObject):
 
     def load_settings(self):
         try:
-            # Ensure the database connection is open
-            if not db.is_closed():
-                db.connect(reuse_if_open=True)
-
             # Check if the Settings table exists; if not, create it
             db.create_tables([Settings], safe=True)
 
             # Try to load settings from the database
             settings_record = Settings.select().where(Settings.key == "app_settings").first()
             if settings_record:
-                return json.loads(settings_record.value)
+                # Fill in keys added since the settings were first saved
+                return {**DEFAULT_SETTINGS, **json.loads(settings_record.value)}
 
             # If no settings exist, create default settings and save them
-            default_settings = {
-                "cloud_api_url": "https://api.primesync.com/v1",
-                "username": "admin",
-                "password": "••••••••",
-                "auto_check_interval": 15,
-                "enable_auto_sync": True,
-                "periodic_sync_time": "12:00 PM",
-                "enable_periodic_sync": True
-            }
+            default_settings = dict(DEFAULT_SETTINGS)
             Settings.create(key="app_settings", value=json.dumps(default_settings))
             return default_settings
 
         except Exception as e:
             print(f"Error loading settings from database: {e}")
             # Fallback to default settings if there's an error
-            return {
-                "cloud_api_url": "https://api.primesync.com/v1",
-                "username": "admin",
-                "password": "••••••••",
-                "auto_check_interval": 15,
-                "enable_auto_sync": True,
-                "periodic_sync_time": "12:00 PM",
-                "enable_periodic_sync": True
-            }
-        finally:
-            if not db.is_closed():
-                db.close()
+            return dict(DEFAULT_SETTINGS)
 
     def save_settings(self):
         try:
-            if not db.is_closed():
-                db.connect(reuse_if_open=True)
-
             settings_record = Settings.select().where(Settings.key == "app_settings").first()
             if settings_record:
                 settings_record.value = json.dumps(self._settings)
@@ -66,9 +55,6 @@ class StateManager(QObject):
                 Settings.create(key="app_settings", value=json.dumps(self._settings))
         except Exception as e:
             print(f"Error saving settings to database: {e}")
-        finally:
-            if not db.is_closed():
-                db.close()
 
     @property
     def settings(self):
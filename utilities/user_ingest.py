@@ -0,0 +1,108 @@
+from peewee import chunked
+from zk import const
+import datetime
+from db.database import db, User
+from utilities.constants import USER_BATCH_SIZE, ROLE_ADMIN, ROLE_USER
+from utilities.attendance_ingest import ingest_unmatched_attendance
+from utilities.logger import logger
+
+
+def device_privilege(role):
+    """Map a local role to a device privilege; devices only distinguish admins from everyone else."""
+    return const.USER_ADMIN if role == ROLE_ADMIN else const.USER_DEFAULT
+
+
+def local_role(privilege, current_role=None):
+    """Map a device privilege back to a local role, keeping the current role if it still matches."""
+    if current_role is not None and device_privilege(current_role) == privilege:
+        return current_role
+    return ROLE_ADMIN if privilege == const.USER_ADMIN else ROLE_USER
+
+
+def device_card(card):
+    """Device card numbers are 32-bit integers; anything else is stored as 0 (no card)."""
+    try:
+        card = int(card)
+    except (TypeError, ValueError):
+        return 0
+    return card if 0 <= card < 2 ** 32 else 0
+
+
+def upsert_device_users(device, device_users, batch_size=USER_BATCH_SIZE):
+    """Insert or update local users from a device roster in bulk and return counts.
+
+    Existing users are loaded once keyed by uid, insert and update rows are computed in
+    memory, and rows whose fields are unchanged are not written at all, so updated_at
+    only moves when something actually changed.
+    """
+    summary = {"records": len(device_users), "inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    existing = {user.uid: user for user in User.select()}
+    taken_user_ids = {user.user_id for user in existing.values()}
+    now = datetime.datetime.now()
+    rows = []
+
+    for device_user in device_users:
+        try:
+            uid = int(device_user.user_id)
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping device user with non-numeric user ID {device_user.user_id!r}")
+            summary["skipped"] += 1
+            continue
+
+        card = str(device_user.card) if device_user.card else None
+        current = existing.get(uid)
+        if current is None:
+            user_id = f"U{uid:03d}"
+            if user_id in taken_user_ids:
+                logger.warning(f"Skipping device user {uid}: user ID {user_id} is already in use")
+                summary["skipped"] += 1
+                continue
+            taken_user_ids.add(user_id)
+            rows.append({
+                "uid": uid,
+                "name": device_user.name or f"User_{uid}",
+                "role": local_role(device_user.privilege),
+                "password": device_user.password or None,
+                "group_id": None,
+                "user_id": user_id,
+                "card": card,
+                "user_cloud_id": None,
+                "device": device.id,
+                "created_at": now,
+                "updated_at": now
+            })
+            summary["inserted"] += 1
+            continue
+
+        values = {
+            "name": device_user.name or current.name,
+            "role": local_role(device_user.privilege, current.role),
+            "password": device_user.password or current.password,
+            "card": card or current.card,
+            "device": device.id
+        }
+        if (current.name, current.role, current.password, current.card, current.device_id) == tuple(values.values()):
+            summary["unchanged"] += 1
+            continue
+        rows.append({
+            "uid": uid,
+            "group_id": current.group_id,
+            "user_id": current.user_id,
+            "user_cloud_id": current.user_cloud_id,
+            "created_at": current.created_at,
+            "updated_at": now,
+            **values
+        })
+        summary["updated"] += 1
+
+    if rows:
+        with db.atomic():
+            for batch in chunked(rows, batch_size):
+                (User.insert_many(batch)
+                 .on_conflict(conflict_target=[User.uid],
+                              preserve=[User.name, User.role, User.password, User.card,
+                                        User.device, User.updated_at])
+                 .execute())
+    if summary["inserted"]:
+        ingest_unmatched_attendance()
+    return summary
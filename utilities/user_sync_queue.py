@@ -0,0 +1,137 @@
+from PySide6.QtCore import QObject, QTimer, Signal
+import datetime
+from db.database import db, Device, DeletedUser
+from utilities.background_task import BackgroundTask
+from utilities.device_sync import DeviceSyncEngine
+from utilities.device_manager import deleted_user_uids
+from utilities.constants import USER_SYNC_DELAY_MS, USER_SYNC_RETRY_MS
+from utilities.logger import logger
+
+
+class UserSyncQueue(QObject):
+    """Collect user changes and send them to devices in one batched session per device.
+
+    Each add/edit/delete restarts a short timer; when it fires, every pending change is
+    applied through DeviceSyncEngine.sync_users on a background thread. Changes made
+    while a batch is in flight are held for the next one. Changes a device did not
+    take (it failed, was offline or its circuit breaker was open) are kept for that
+    device and sent again with the next batch, or on a slower retry timer when no new
+    changes arrive; offline devices are skipped until a health check finds them back.
+    A delete's DeletedUser tombstone is dropped once every device has applied it, and
+    resume() re-queues the deletes still outstanding from an earlier session.
+    """
+    sync_started = Signal(int)  # Number of user changes in the batch
+    sync_finished = Signal(list)  # DeviceSyncResult per device
+    sync_failed = Signal(str)
+
+    def __init__(self, delay_ms=USER_SYNC_DELAY_MS, retry_ms=USER_SYNC_RETRY_MS, parent=None):
+        super().__init__(parent)
+        self._pending = {}  # uid -> "upsert" | "delete"; the latest change wins
+        self._missed = {}  # device id -> {uid: change} the device has not applied yet
+        self._in_flight = None  # (changes, missed, started) of the running batch
+        self._task = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+        self._retry_timer = QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.setInterval(retry_ms)
+        self._retry_timer.timeout.connect(self.flush)
+
+    def upsert(self, *uids):
+        for uid in uids:
+            self._pending[uid] = "upsert"
+        self._timer.start()
+
+    def delete(self, *uids):
+        for uid in uids:
+            self._pending[uid] = "delete"
+        self._timer.start()
+
+    def resume(self):
+        """Queue the deletes of users whose tombstones no device round has cleared yet."""
+        with db.connection_context():
+            uids = deleted_user_uids()
+        if uids:
+            logger.info(f"Resuming {len(uids)} user deletes not yet applied to every device")
+            self.delete(*uids)
+
+    def flush(self):
+        """Send all pending changes, and those devices missed before, now, unless a batch is already running."""
+        if self._task is not None or not (self._pending or self._missed):
+            return
+        self._retry_timer.stop()
+        changes, self._pending = self._pending, {}
+        self._in_flight = (changes, self._missed, datetime.datetime.now())
+        logger.info(f"Syncing {len(changes)} user changes to devices"
+                    + (f", retrying missed changes on {len(self._missed)} devices" if self._missed else ""))
+
+        # Parented to the queue so Qt keeps the thread alive until it has fully stopped
+        self._task = BackgroundTask(self._sync, changes, self._missed, parent=self)
+        self._task.succeeded.connect(self._on_finished)
+        self._task.failed.connect(self._on_failed)
+        self._task.finished.connect(self._task.deleteLater)
+        self.sync_started.emit(len(changes))
+        self._task.start()
+
+    @staticmethod
+    def device_changes(device_id, changes, missed):
+        """The changes a device still needs: what it missed, overridden by anything newer."""
+        return {**missed.get(device_id, {}), **changes}
+
+    @classmethod
+    def _sync(cls, changes, missed):
+        """Run on the worker: one sync_users call per distinct change set, so unaffected devices share a round."""
+        with db.connection_context():
+            devices = list(Device.select())
+        groups = {}
+        for device in devices:
+            device_changes = cls.device_changes(device.id, changes, missed)
+            if device_changes:
+                groups.setdefault(frozenset(device_changes.items()), []).append(device)
+
+        engine = DeviceSyncEngine()
+        results = []
+        for change_set, group in groups.items():
+            upsert_uids = [uid for uid, change in change_set if change == "upsert"]
+            delete_uids = [uid for uid, change in change_set if change == "delete"]
+            results.extend(engine.sync_users(upsert_uids, delete_uids, devices=group))
+        return results
+
+    def _on_finished(self, results):
+        changes, missed, started = self._in_flight
+        # Rebuilt from this round, so devices that were deleted meanwhile are forgotten
+        self._missed = {result.device.id: self.device_changes(result.device.id, changes, missed)
+                        for result in results if not result.success}
+        self._task = self._in_flight = None
+        self._forget_applied_deletes(changes, missed, started)
+        self.sync_finished.emit(results)
+        self._resume()
+
+    def _on_failed(self, error):
+        changes, missed, _ = self._in_flight
+        # Nothing is known to have been applied; keep everything for every device
+        self._pending = {**changes, **self._pending}
+        self._missed = missed
+        self._task = self._in_flight = None
+        self.sync_failed.emit(error)
+        self._resume()
+
+    def _forget_applied_deletes(self, changes, missed, started):
+        """Drop the tombstones of deletes in this round that no device still has to apply."""
+        sent = {uid for device_changes in [changes, *missed.values()]
+                for uid, change in device_changes.items() if change == "delete"}
+        outstanding = {uid for device_changes in self._missed.values()
+                       for uid, change in device_changes.items() if change == "delete"}
+        applied = sent - outstanding
+        if applied:
+            with db.connection_context():
+                DeletedUser.delete().where(DeletedUser.uid.in_(list(applied)) &
+                                           (DeletedUser.deleted_at <= started)).execute()
+
+    def _resume(self):
+        if self._pending:
+            self._timer.start()
+        elif self._missed:
+            self._retry_timer.start()